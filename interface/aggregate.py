@@ -0,0 +1,74 @@
+import threading
+from collections import deque
+
+
+class WindowAggregate:
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()
+        # monotonic deques, the front holds the window's minimum and maximum
+        self.minimums = deque()
+        self.maximums = deque()
+        self.sum = 0.0
+        self.last = None
+        self.lock = threading.Lock()
+
+    def add(self, timestamp, value):
+        with self.lock:
+            self.samples.append((timestamp, value))
+            self.sum += value
+            while self.minimums and self.minimums[-1][1] >= value:
+                self.minimums.pop()
+            self.minimums.append((timestamp, value))
+            while self.maximums and self.maximums[-1][1] <= value:
+                self.maximums.pop()
+            self.maximums.append((timestamp, value))
+            self.last = (timestamp, value)
+            self._expire(timestamp)
+
+    def extend(self, timestamps, values):
+        for timestamp, value in zip(timestamps.tolist(), values.tolist()):
+            self.add(timestamp, value)
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self.samples and self.samples[0][0] < cutoff:
+            self.sum -= self.samples.popleft()[1]
+        while self.minimums and self.minimums[0][0] < cutoff:
+            self.minimums.popleft()
+        while self.maximums and self.maximums[0][0] < cutoff:
+            self.maximums.popleft()
+        if not self.samples:
+            self.sum = 0.0
+
+    def snapshot(self, now):
+        with self.lock:
+            self._expire(now)
+            if not self.samples:
+                return None
+            return {
+                'count': len(self.samples),
+                'mean': self.sum / len(self.samples),
+                'min': self.minimums[0][1],
+                'max': self.maximums[0][1],
+                'last': self.last[1],
+            }
+
+
+class JumpDetector:
+    def __init__(self, threshold, max_gap=2):
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.previous = None
+        self.last_event = None
+
+    def add(self, timestamp, value):
+        if self.previous is not None:
+            previous_timestamp, previous_value = self.previous
+            if timestamp - previous_timestamp <= self.max_gap and abs(value - previous_value) > self.threshold:
+                self.last_event = timestamp
+        self.previous = (timestamp, value)
+
+    def extend(self, timestamps, values):
+        for timestamp, value in zip(timestamps.tolist(), values.tolist()):
+            self.add(timestamp, value)
@@ -1,329 +1,46 @@
-import os
+import argparse
+import json
+import queue
 import sys
 
-import serial
-import serial.tools.list_ports
-import threading
 import time
+import traceback
 from datetime import datetime
+import threading
 import tkinter as tk
 import tkinter.ttk as ttk
-import pandas as pd
-import matplotlib
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import configparser
-
-matplotlib.use("TkAgg")
-plt.tight_layout()
-
-config = configparser.ConfigParser()
-config.read('config.ini')
-
-data_path = config['default']['readings_folder']
-tmp116_data = data_path + config['default']['tmp116_readings']
-opt3001_data = data_path + config['default']['opt3001_readings']
-hdc2010_humidity_data = data_path + config['default']['hdc2010_humidity_readings']
-hdc2010_temperature_data = data_path + config['default']['hdc2010_temperature_readings']
-dps310_pressure_data = data_path + config['default']['dps310_pressure_readings']
-dps310_temperature_data = data_path + config['default']['dps310_temperature_readings']
-
-csv_files = [tmp116_data,
-             opt3001_data,
-             hdc2010_humidity_data,
-             hdc2010_temperature_data,
-             dps310_pressure_data,
-             dps310_temperature_data]
-
-column_names = ['Vrijeme', 'Senzor', 'Velicina', 'Iznos']
-
-BUFFER_LENGTH = config['default']['buffer_window']
-
-TEMP_COMFORT_LOW = float(config['default']['temperature_comfort_low'])
-TEMP_COMFORT_HIGH = float(config['default']['temperature_comfort_high'])
-HUM_COMFORT_LOW = int(config['default']['humidity_comfort_low'])
-HUM_COMFORT_HIGH = int(config['default']['humidity_comfort_high'])
-LIGHT_THRESHOLD = int(config['default']['light_threshold'])
-TEMP_MIN = float(config['default']['temperature_low'])
-TEMP_MAX = float(config['default']['temperature_high'])
-HUM_MIN = int(config['default']['humidity_low'])
-HUM_MAX = int(config['default']['humidity_high'])
-LUX_MIN = int(config['default']['light_min'])
-LUX_MAX = int(config['default']['light_max'])
-PRESSURE_JUMP = int(config['default']['pressure_jump_threshold'])
-
-light_status = 0
-heating_status = 0
-cooling_status = 0
-humidifier_status = 0
-
-serial_ports = serial.tools.list_ports.comports()
-baud_rates = [110, 300, 600, 1200, 2400, 4800, 9600, 14400, 19200, 38400, 57600, 115200, 128000, 256000]
-serial_port = config['default']['port']
-baud_rate = config['default']['baud']
-serial_status = False
+
+import metrics
+import service
+from client import LocalClient, RemoteClient
+from dispatch import Dispatcher
+from service import BUFFER_LENGTH, HUM_MAX, HUM_MIN, LUX_MAX, LUX_MIN, TEMP_MAX, TEMP_MIN, baud_rates
+from viewmodel import BoundLabel, dashboard_texts, measurement_layout
+
+client = None
 
 LARGE_FONT = ("Verdana", 18)
 MEDIUM_FONT = ("Verdana", 14)
 SMALL_FONT = ("Verdana", 12)
 APP_NAME = 'Pametni stan'
-TEMPERATURE_INTERVAL = int(config['default']['temperature_interval'])
-HUMIDITY_INTERVAL = int(config['default']['humidity_interval'])
-LIGHT_INTERVAL = int(config['default']['light_interval'])
-PRESSURE_INTERVAL = int(config['default']['pressure_interval'])
 
 WINDOW_X = 1400
 WINDOW_Y = 800
 FIGURE_SIZE = (7, 5)
 DPI = 60
+# min/max decimation keeps two points for every pixel column of a plot
+PLOT_POINTS = FIGURE_SIZE[0] * DPI * 2
 
-measurement_lut = {
-    'T': ["Temperatura zraka", "°C", [0.07, 0.2125], [0.36, 0.2125]],
-    'H': ["Vlažnost zraka", "%", [0.07, 0.25], [0.36, 0.25]],
-    'P': ["Atmosferski tlak", "hPa", [0.07, 0.375], [0.36, 0.375]],
-    'L': ["Ambijentalna svjetlost", "lux", [0.07, 0.4125], [0.36, 0.4125]]
-}
-
-open_timestamp = ""
-
-
-def file_check():
-    if not os.path.exists(data_path):
-        os.makedirs(data_path)
-
-    if len(os.listdir(data_path)) == 0:
-        open(tmp116_data, 'a').close()
-        open(opt3001_data, 'a').close()
-        open(hdc2010_humidity_data, 'a').close()
-        open(hdc2010_temperature_data, 'a').close()
-        open(dps310_pressure_data, 'a').close()
-        open(dps310_temperature_data, 'a').close()
-
-
-def check_serial():
-    global serial_status
-    for port in serial_ports:
-        if serial_port in port:
-            serial_status = True
-            return
-    serial_status = False
+SUMMARY = "Sve stanice"
 
+graph_ranges = {
+    f"{BUFFER_LENGTH} minuta": int(BUFFER_LENGTH) * 60,
+    "24 sata": 24 * 3600,
+    "7 dana": 7 * 24 * 3600,
+    "30 dana": 30 * 24 * 3600,
+}
 
-def read_serial():
-    with open(tmp116_data, 'a', newline='') as tmp116_file, \
-            open(opt3001_data, 'a', newline='') as opt3001_file, \
-            open(hdc2010_humidity_data, 'a', newline='') as hdc2010_hum_file, \
-            open(hdc2010_temperature_data, 'a', newline='') as hdc2010_temp_file, \
-            open(dps310_pressure_data, 'a', newline='') as dps310_pressure_file, \
-            open(dps310_temperature_data, 'a', newline='') as dps310_temp_file:
-
-        for i in range(len(csv_files)):
-            serial_input = serial_connection.readline()
-
-            timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-
-            if serial_input:
-                line = serial_input.decode()
-                line_split = line.split(', ')
-
-                if line_split[0] == 'TMP116':
-                    tmp116_file.write(timestamp + ', ' + line)
-                elif line_split[0] == 'OPT3001':
-                    opt3001_file.write(timestamp + ', ' + line)
-                elif line_split[0] == 'HDC2010':
-                    if line_split[1] == 'H':
-                        hdc2010_hum_file.write(timestamp + ', ' + line)
-                    elif line_split[1] == 'T':
-                        hdc2010_temp_file.write(timestamp + ', ' + line)
-                elif line_split[0] == 'DPS310':
-                    if line_split[1] == 'P':
-                        dps310_pressure_file.write(timestamp + ', ' + line)
-                    elif line_split[1] == 'T':
-                        dps310_temp_file.write(timestamp + ', ' + line)
-
-
-def write_serial():
-    serial_connection.write(f"{light_status}{heating_status}{cooling_status}{humidifier_status}|"
-                            .encode('utf-8'))
-
-
-def clean_buffer(filelist):
-    now = datetime.now()
-    for file in filelist:
-        with open(file, 'r') as buffer:
-            valid = []
-            lines = buffer.readlines()
-            if len(lines) > 0:
-                for row in lines:
-                    timestamp = datetime.strptime(row.split(", ")[0], "%d/%m/%Y %H:%M:%S")
-                    time_diff = now - timestamp
-                    if int(BUFFER_LENGTH) * 60 >= time_diff.total_seconds() >= 0:
-                        valid.append(row)
-        buffer.close()
-
-        with open(file, 'w') as buffer:
-            buffer.writelines(valid)
-        buffer.close()
-
-
-def update_config():
-    with open('config.ini', 'w') as configfile:
-        config.write(configfile)
-
-
-def check_pressure():
-    global open_timestamp
-    now = datetime.now()
-
-    data = pd.read_csv(dps310_pressure_data, names=column_names)
-    data['Iznos'] = pd.to_numeric(data['Iznos'], errors='coerce')
-    data = data.dropna(subset=['Iznos'])
-
-    recent = []
-
-    if len(data) > 0:
-        timestamps = data['Vrijeme'].values
-        readings = data['Iznos'].values
-
-        for i in range(len(timestamps)):
-            timestamp = datetime.strptime(timestamps[i], "%d/%m/%Y %H:%M:%S")
-            time_diff = now - timestamp
-            if 2 >= time_diff.total_seconds() >= 0:
-                recent.append(float(readings[i]))
-
-    for i in range(1, len(recent)):
-        if abs(recent[i] - recent[i - 1]) > PRESSURE_JUMP:
-            open_timestamp = now.strftime("%H:%M")
-
-
-figureTMP116 = plt.Figure(figsize=FIGURE_SIZE, dpi=DPI)
-figureHDC2010TMP = plt.Figure(figsize=FIGURE_SIZE, dpi=DPI)
-figureDPS310TMP = plt.Figure(figsize=FIGURE_SIZE, dpi=DPI)
-figurePressure = plt.Figure(figsize=FIGURE_SIZE, dpi=DPI)
-figureOPT = plt.Figure(figsize=FIGURE_SIZE, dpi=DPI)
-figureHumidity = plt.Figure(figsize=FIGURE_SIZE, dpi=DPI)
-
-
-def animateOPT(i):
-    data = pd.read_csv(opt3001_data, names=column_names).values
-    values = []
-    timestamps = []
-
-    for row in data:
-        values.append(round(row[-1], 2))
-        timestamp = datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S")
-        timestamps.append(timestamp)
-
-    figureOPT.clear()
-    axOPT = figureOPT.add_subplot(111)
-    axOPT.plot(values, color='red')
-    axOPT.set_title("OPT3001 - ambijentalno osvjetljenje")
-    axOPT.set_ylabel("lux")
-    axOPT.set_xlabel("Vrijeme")
-    axOPT.axes.xaxis.set_ticks([])
-    figureOPT.canvas.draw()
-
-
-def animatePressure(i):
-    data = pd.read_csv(dps310_pressure_data, names=column_names).values
-    values = []
-    timestamps = []
-
-    for row in data:
-        values.append(round(row[-1] / 100, 4))
-        timestamp = datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S")
-        timestamps.append(timestamp)
-
-    figurePressure.clear()
-    axPressure = figurePressure.add_subplot(111)
-    axPressure.plot(values, color='red')
-    axPressure.set_title("DPS310 - atmosferski tlak")
-    axPressure.set_xlabel("Vrijeme")
-    axPressure.set_ylabel("hPa")
-    axPressure.get_yaxis().get_major_formatter().set_useOffset(False)
-    axPressure.axes.xaxis.set_ticks([])
-    figurePressure.canvas.draw()
-
-
-def animateTMP116(i):
-    data = pd.read_csv(tmp116_data, names=column_names).values
-    values = []
-    timestamps = []
-
-    for row in data:
-        values.append(round(row[-1], 2))
-        timestamp = datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S")
-        timestamps.append(timestamp)
-
-    figureTMP116.clear()
-    axTMP116 = figureTMP116.add_subplot(111)
-    axTMP116.plot(values, color='red')
-    axTMP116.set_title("TMP116")
-    axTMP116.set_ylabel("°C")
-    axTMP116.set_xlabel("Vrijeme")
-    axTMP116.axes.xaxis.set_ticks([])
-    figureTMP116.canvas.draw()
-
-
-def animateHDC2010TMP(i):
-    data = pd.read_csv(hdc2010_temperature_data, names=column_names).values
-    values = []
-    timestamps = []
-
-    for row in data:
-        values.append(round(row[-1], 2))
-        timestamp = datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S")
-        timestamps.append(timestamp)
-
-    figureHDC2010TMP.clear()
-    axHDC2010TMP = figureHDC2010TMP.add_subplot(111)
-    axHDC2010TMP.plot(values, color='red')
-    axHDC2010TMP.set_title("HDC2010 - temperatura zraka")
-    axHDC2010TMP.set_ylabel("°C")
-    axHDC2010TMP.set_xlabel("Vrijeme")
-    axHDC2010TMP.axes.xaxis.set_ticks([])
-    figureHDC2010TMP.canvas.draw()
-
-
-def animateDPS310TMP(i):
-    data = pd.read_csv(dps310_temperature_data, names=column_names).values
-    values = []
-    timestamps = []
-
-    for row in data:
-        values.append(round(row[-1], 2))
-        timestamp = datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S")
-        timestamps.append(timestamp)
-
-    figureDPS310TMP.clear()
-    axDPS310TMP = figureDPS310TMP.add_subplot(111)
-    axDPS310TMP.plot(values, color='red')
-    axDPS310TMP.set_title("DPS310 - temperatura zraka")
-    axDPS310TMP.set_ylabel("°C")
-    axDPS310TMP.set_xlabel("Vrijeme")
-    axDPS310TMP.axes.xaxis.set_ticks([])
-    figureDPS310TMP.canvas.draw()
-
-
-def animateHumidity(i):
-    data = pd.read_csv(hdc2010_humidity_data, names=column_names).values
-    values = []
-    timestamps = []
-
-    for row in data:
-        values.append(round(row[-1], 2))
-        timestamp = datetime.strptime(row[0], "%d/%m/%Y %H:%M:%S")
-        timestamps.append(timestamp)
-
-    figureHumidity.clear()
-    axHumidity = figureHumidity.add_subplot(111)
-    axHumidity.plot(values, color='red')
-    axHumidity.set_title("HDC2010 - relativna vlažnost zraka")
-    axHumidity.set_ylabel("%")
-    axHumidity.set_xlabel("Vrijeme")
-    axHumidity.axes.xaxis.set_ticks([])
-    figureHumidity.canvas.draw()
+measurement_lut = measurement_layout(service.streams.values())
 
 
 class MainView(tk.Frame):
@@ -341,20 +58,32 @@ class MainView(tk.Frame):
         button = tk.Button(self, text="Očitanja senzora", command=lambda: controller.show_frame(GraphView))
         button.place(relx=0.07, rely=0.47)
 
+        self.controller = controller
+        self.shown_station = controller.station
+        settings = controller.settings
+        if len(controller.stations) > 1:
+            station_label = tk.Label(self, text="Stanica:", font=MEDIUM_FONT)
+            station_label.place(relx=0.07, rely=0.1)
+            self.station_box = ttk.Combobox(self, values=controller.stations + [SUMMARY])
+            self.station_box.set(controller.station)
+            self.station_box['state'] = 'readonly'
+            self.station_box.place(relx=0.145, rely=0.105)
+            self.station_box.bind('<<ComboboxSelected>>', self.update_station)
+
         settings_title = tk.Label(self, text="Postavke", font=LARGE_FONT)
         settings_title.place(relx=0.7, rely=0.1625)
 
         port_label = tk.Label(self, text="Uređaj:", font=MEDIUM_FONT)
         port_label.place(relx=0.7, rely=0.225)
-        self.port_box = ttk.Combobox(self, values=serial_ports)
-        self.port_box.set(serial_port)
+        self.port_box = ttk.Combobox(self, postcommand=self.list_ports)
+        self.port_box.set(settings['port'])
         self.port_box['state'] = 'readonly'
         self.port_box.place(relx=0.775, rely=0.230)
 
         baud_label = tk.Label(self, text="Baud:", font=MEDIUM_FONT)
         baud_label.place(relx=0.7, rely=0.2625)
         self.baud_box = ttk.Combobox(self, values=baud_rates)
-        self.baud_box.set(baud_rate)
+        self.baud_box.set(settings['baud'])
         self.baud_box['state'] = 'readonly'
         self.baud_box.place(relx=0.775, rely=0.270)
 
@@ -365,7 +94,7 @@ class MainView(tk.Frame):
         light_label.place(relx=0.07, rely=0.58)
         self.light_slider = tk.Scale(self, from_=LUX_MIN, to=LUX_MAX, sliderlength=20, length=250,
                                      resolution=1, orient=tk.HORIZONTAL)
-        self.light_slider.set(LIGHT_THRESHOLD)
+        self.light_slider.set(settings['light_threshold'])
         self.light_slider.place(relx=0.07, rely=0.64)
 
         light_button = tk.Button(self, text="Ažuriraj", command=self.update_light)
@@ -377,20 +106,19 @@ class MainView(tk.Frame):
                                   sliderlength=20, length=250, resolution=0.1,
                                   label="Donja granica", orient=tk.HORIZONTAL)
 
-        self.temp_slider_lo.set(TEMP_COMFORT_LOW)
+        self.temp_slider_lo.set(settings['temperature_comfort_low'])
         self.temp_slider_lo.place(relx=0.36, rely=0.625)
 
         self.temp_slider_hi = tk.Scale(self, from_=TEMP_MIN, to=TEMP_MAX,
                                   sliderlength=20, length=250, resolution=0.1,
                                   label="Gornja granica", orient=tk.HORIZONTAL)
-        self.temp_slider_hi.set(TEMP_COMFORT_HIGH)
+        self.temp_slider_hi.set(settings['temperature_comfort_high'])
         self.temp_slider_hi.place(relx=0.36, rely=0.72)
 
         temp_button = tk.Button(self, text="Ažuriraj", command=self.update_temp)
         temp_button.place(relx=0.36, rely=0.82)
 
-        self.temp_status = tk.Label(self, text="", font=SMALL_FONT)
-        self.temp_status.place(relx=0.36, rely=0.8325)
+        self.temp_status = BoundLabel(self, SMALL_FONT, 0.36, 0.86)
 
         hum_label = tk.Label(self, text="Ugodni raspon vlažnosti zraka", font=SMALL_FONT)
         hum_label.place(relx=0.64, rely=0.58)
@@ -398,318 +126,330 @@ class MainView(tk.Frame):
                                   sliderlength=20, length=250,
                                   label="Donja granica", orient=tk.HORIZONTAL)
 
-        self.hum_slider_lo.set(HUM_COMFORT_LOW)
+        self.hum_slider_lo.set(settings['humidity_comfort_low'])
         self.hum_slider_lo.place(relx=0.64, rely=0.625)
 
         self.hum_slider_hi = tk.Scale(self, from_=HUM_MIN, to=HUM_MAX,
                                   sliderlength=20, length=250,
                                   label="Gornja granica", orient=tk.HORIZONTAL)
-        self.hum_slider_hi.set(HUM_COMFORT_HIGH)
+        self.hum_slider_hi.set(settings['humidity_comfort_high'])
         self.hum_slider_hi.place(relx=0.64, rely=0.72)
 
         hum_button = tk.Button(self, text="Ažuriraj", command=self.update_hum)
         hum_button.place(relx=0.64, rely=0.82)
 
-        self.hum_status = tk.Label(self, text="", font=SMALL_FONT)
-        self.hum_status.place(relx=0.64, rely=0.8325)
-
-        self.readings = {}
-        self.update_data()
-
-    def update_data(self):
-        long_term_files = [tmp116_data, hdc2010_humidity_data]
-        short_term_files = [dps310_pressure_data, opt3001_data]
-
-        for file in long_term_files:
-            data = pd.read_csv(file, names=column_names)
-            if not data.empty:
-                unit = data['Velicina'][0].strip()
-                data['Iznos'] = pd.to_numeric(data['Iznos'], errors='coerce')
-                data = data.dropna(subset=['Iznos'])
-
-                if unit == 'T':
-                    average = round(data['Iznos'].mean(), 1)
-                else:
-                    average = round(data['Iznos'].mean())
-
-                avg_message = f"-{measurement_lut[unit][0]}: " + str(average) + ' ' + measurement_lut[unit][1]
-                avg_label = tk.Label(self, text=avg_message, font=MEDIUM_FONT)
-                avg_label.place(relx=measurement_lut[unit][2][0], rely=measurement_lut[unit][2][1])
-                avg_label.after(1250, avg_label.destroy)
-                self.readings[unit] = average
-
-        for file in short_term_files:
-            data = pd.read_csv(file, names=column_names)
-            if not data.empty:
-                unit = data['Velicina'][0].strip()
-                data['Iznos'] = pd.to_numeric(data['Iznos'], errors='coerce')
-                data = data.dropna(subset=['Iznos'])
-                measurements = data['Iznos'].values
-                current = measurements[-1]
-
-                if unit == 'P':
-                    current = round(current / 100, 1)
-                else:
-                    current = round(current)
-
-                current_message = f"-{measurement_lut[unit][0]}: " + str(current) + ' ' + measurement_lut[unit][1]
-                current_label = tk.Label(self, text=current_message, font=MEDIUM_FONT)
-                current_label.place(relx=measurement_lut[unit][2][0], rely=measurement_lut[unit][2][1])
-                current_label.after(1250, current_label.destroy)
-                self.readings[unit] = current
-
-    def check_actions(self):
-        global light_status, humidifier_status, heating_status, cooling_status
-
-        if serial_status:
-            if not serial_connection.isOpen():
-                serial_error_label = tk.Label(self, text="Uređaj nije spojen!", font=MEDIUM_FONT)
-                serial_error_label.place(relx=0.7, rely=0.3875)
-        else:
-            serial_error_label = tk.Label(self, text="Uređaj nije pronađen!", font=MEDIUM_FONT)
-            serial_error_label.place(relx=0.7, rely=0.3875)
-
-        for unit in self.readings:
-            value = self.readings[unit]
-            message_text = ""
-            if unit == 'T':
-                if TEMP_COMFORT_HIGH > value > TEMP_COMFORT_LOW:
-                    message_text = "Temperatura je ugodna"
-                    heating_status = 0
-                    cooling_status = 0
-                elif value >= TEMP_COMFORT_HIGH:
-                    message_text = "Temperatura je visoka, upalite klimu"
-                    heating_status = 0
-                    cooling_status = 1
-                elif value <= TEMP_COMFORT_LOW:
-                    message_text = "Temperatura je niska, upalite grijanje"
-                    heating_status = 1
-                    cooling_status = 0
-
-                message_label = tk.Label(self, text=message_text, font=MEDIUM_FONT)
-                message_label.place(relx=measurement_lut[unit][3][0], rely=measurement_lut[unit][3][1])
-                message_label.after(1250, message_label.destroy)
-
-            elif unit == 'H':
-                if HUM_COMFORT_HIGH > value > HUM_COMFORT_LOW:
-                    message_text = "Vlažnost zraka je ugodna"
-                    humidifier_status = 0
-                elif value >= HUM_COMFORT_HIGH:
-                    message_text = "Vlažnost zraka je visoka"
-                    humidifier_status = 0
-                elif value <= HUM_COMFORT_LOW:
-                    message_text = "Vlažnost zraka je niska"
-                    humidifier_status = 1
-
-                message_label = tk.Label(self, text=message_text, font=MEDIUM_FONT)
-                message_label.place(relx=measurement_lut[unit][3][0], rely=measurement_lut[unit][3][1])
-                message_label.after(1250, message_label.destroy)
-
-            elif unit == 'L':
-                if value <= LIGHT_THRESHOLD:
-                    message_text = "Mračno je, upalite svjetlo"
-                    message_label = tk.Label(self, text=message_text, font=MEDIUM_FONT)
-                    message_label.place(relx=measurement_lut[unit][3][0], rely=measurement_lut[unit][3][1])
-                    message_label.after(1250, message_label.destroy)
-                    light_status = 1
-                else:
-                    light_status = 0
-
-            elif unit == 'P':
-                check_pressure()
-                message_text = ""
-                if open_timestamp != "":
-                    message_text = "Prozor je zadnje otvaran/zatvaran u: " + open_timestamp
-                message_label = tk.Label(self, text=message_text, font=MEDIUM_FONT)
-                message_label.place(relx=measurement_lut[unit][3][0], rely=measurement_lut[unit][3][1])
+        self.hum_status = BoundLabel(self, SMALL_FONT, 0.64, 0.86)
+
+        self.labels = {'serial': BoundLabel(self, MEDIUM_FONT, 0.7, 0.3875)}
+        for unit, (name, symbol, reading_position, message_position) in measurement_lut.items():
+            self.labels['reading', unit] = BoundLabel(self, MEDIUM_FONT, *reading_position)
+            self.labels['message', unit] = BoundLabel(self, MEDIUM_FONT, *message_position)
+        self.serial_note = BoundLabel(self, SMALL_FONT, 0.7, 0.35)
+        self.clock = BoundLabel(self, MEDIUM_FONT, 0.875, 0.04375)
+
+        self.settings = settings
+
+    def list_ports(self):
+        self.port_box['values'] = service.serial_ports()
+
+    def update_data(self, data):
+        self.settings = data['settings']
+        if data['station'] != self.shown_station:
+            self.shown_station = data['station']
+            self.port_box.set(self.settings['port'])
+            self.baud_box.set(self.settings['baud'])
+        for key, text in dashboard_texts(data, measurement_lut).items():
+            self.labels[key].set(text)
 
     def update_time(self):
-        time_label = tk.Label(self, text=datetime.now().strftime("%H:%M"), font=MEDIUM_FONT)
-        time_label.place(relx=0.875, rely=0.04375)
-        time_label.after(1500, time_label.destroy)
+        self.clock.set(datetime.now().strftime("%H:%M"))
+
+    def update_station(self, event):
+        station = self.station_box.get()
+        self.controller.select_station(None if station == SUMMARY else station)
 
     def update_light(self):
-        global LIGHT_THRESHOLD
         value = self.light_slider.get()
-        LIGHT_THRESHOLD = value
-        config.set('default', 'light_threshold', str(value))
-        update_config()
+        client.update_settings({'light_threshold': value})
 
     def update_temp(self):
-        global TEMP_COMFORT_LOW, TEMP_COMFORT_HIGH
         low = self.temp_slider_lo.get()
         high = self.temp_slider_hi.get()
-        self.temp_status.destroy()
+        self.temp_status.set("")
 
         if low >= high:
-            self.temp_slider_lo.set(TEMP_COMFORT_LOW)
-            self.temp_slider_hi.set(TEMP_COMFORT_HIGH)
-            self.temp_status = tk.Label(self, text="Donja granica ne može biti veća od gornje", font=SMALL_FONT)
-            self.temp_status.place(relx=0.36, rely=0.86)
+            self.temp_slider_lo.set(self.settings['temperature_comfort_low'])
+            self.temp_slider_hi.set(self.settings['temperature_comfort_high'])
+            self.temp_status.set("Donja granica ne može biti veća od gornje")
             return
 
-        TEMP_COMFORT_LOW, TEMP_COMFORT_HIGH = low, high
-        config.set('default', 'temperature_comfort_low', str(low))
-        config.set('default', 'temperature_comfort_high', str(high))
-        update_config()
+        client.update_settings({'temperature_comfort_low': low, 'temperature_comfort_high': high})
 
     def update_hum(self):
-        global HUM_COMFORT_LOW, HUM_COMFORT_HIGH
         low = self.hum_slider_lo.get()
         high = self.hum_slider_hi.get()
-        self.hum_status.destroy()
+        self.hum_status.set("")
 
         if low >= high:
-            self.hum_slider_lo.set(HUM_COMFORT_LOW)
-            self.hum_slider_hi.set(HUM_COMFORT_HIGH)
-            self.hum_status = tk.Label(self, text="Donja granica ne može biti veća od gornje", font=SMALL_FONT)
-            self.hum_status.place(relx=0.64, rely=0.86)
+            self.hum_slider_lo.set(self.settings['humidity_comfort_low'])
+            self.hum_slider_hi.set(self.settings['humidity_comfort_high'])
+            self.hum_status.set("Donja granica ne može biti veća od gornje")
             return
 
-        HUM_COMFORT_LOW, HUM_COMFORT_HIGH = low, high
-        config.set('default', 'humidity_comfort_low', str(low))
-        config.set('default', 'humidity_comfort_high', str(high))
-        update_config()
+        client.update_settings({'humidity_comfort_low': low, 'humidity_comfort_high': high})
 
     def update_serial(self):
-        global serial_port, baud_rate
         port_string = self.port_box.get()
         port = port_string.split(" ")[0]
-        serial_port = port
         baud = self.baud_box.get()
-        baud_rate = int(baud)
-        config.set('default', 'port', serial_port)
-        config.set('default', 'baud', baud)
-        update_config()
+        client.update_settings({'port': port, 'baud': int(baud)}, self.controller.station)
 
-        serial_label = tk.Label(self, text="Ponovno pokrenite da bi se učitale promjene", font=SMALL_FONT)
-        serial_label.place(relx=0.7, rely=0.35)
+        self.serial_note.set("Spremljeno, veza se ponovno uspostavlja")
 
 
 class GraphView(tk.Frame):
     def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent)
-        label = tk.Label(self, text=f"Očitanja senzora u proteklih {BUFFER_LENGTH} minuta", font=LARGE_FONT)
-        label.pack(padx=20, pady=30)
+        range_name = next(iter(graph_ranges))
+        self.title = tk.Label(self, text=f"Očitanja senzora u proteklih {range_name}", font=LARGE_FONT)
+        self.title.pack(padx=20, pady=30)
 
         button = tk.Button(self, text="Natrag", command=lambda: controller.show_frame(MainView))
         button.place(relx=0.07, rely=0.9)
 
-        canvas = FigureCanvasTkAgg(figureTMP116, self)
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.07, rely=0.125)
-
-        canvas = FigureCanvasTkAgg(figureHDC2010TMP, self)
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.36, rely=0.125)
-
-        canvas = FigureCanvasTkAgg(figureDPS310TMP, self)
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.64, rely=0.125)
-
-        canvas = FigureCanvasTkAgg(figureHumidity, self)
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.07, rely=0.5)
+        range_label = tk.Label(self, text="Raspon:", font=MEDIUM_FONT)
+        range_label.place(relx=0.64, rely=0.9)
+        self.range_box = ttk.Combobox(self, values=list(graph_ranges))
+        self.range_box.set(range_name)
+        self.range_box['state'] = 'readonly'
+        self.range_box.place(relx=0.715, rely=0.905)
+        self.range_box.bind('<<ComboboxSelected>>', self.update_range)
+        self.clock = BoundLabel(self, MEDIUM_FONT, 0.875, 0.04375)
+
+        self.controller = controller
+        self.range = graph_ranges[range_name]
+        self.plots = []
+        # plots whose data is still being fetched, only touched on the Tk thread
+        self.querying = set()
+        self.queries = queue.SimpleQueue()
+        threading.Thread(target=self.run_queries, name="graph-query", daemon=True).start()
+
+        plotted = [stream for stream in service.streams.values() if stream.plot is not None]
+        if controller.render_worker:
+            # the charts are drawn in another process, Tk only copies the finished bitmaps
+            from render import BitmapPlot, RenderWorker
+
+            worker = RenderWorker(len(plotted), FIGURE_SIZE, DPI, PLOT_POINTS)
+        else:
+            # matplotlib takes longer to import than everything else together, so it waits for the first graph
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            from matplotlib.figure import Figure
+            from plots import LivePlot
+
+        for stream in plotted:
+            if controller.render_worker:
+                plot = BitmapPlot(self, worker, controller.dispatcher, stream.title, stream.unit, self.range,
+                                  stream.scale)
+                widget = plot.widget
+            else:
+                figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+                canvas = FigureCanvasTkAgg(figure, self)
+                plot = LivePlot(figure, stream.title, stream.unit, self.range, stream.scale)
+                canvas.draw()
+                widget = canvas.get_tk_widget()
+            widget.place(relx=stream.plot[0], rely=stream.plot[1])
+            self.plots.append(plot)
+            # every plot is redrawn about as often as its stream delivers a new sample
+            self.animate(plot, stream.key, stream.refresh)
+
+    def animate(self, plot, stream, interval, due=None):
+        name = '_'.join(stream)
+        if due is not None:
+            # a callback more than a whole interval late has skipped a frame
+            late = max(0.0, time.monotonic() - due)
+            metrics.observe('animate_lateness', late, plot=name)
+            if late > interval / 1000:
+                metrics.count('animate_missed', plot=name)
+        # a plot whose previous query has not come back yet skips this frame
+        if self.controller.current_frame is self and plot not in self.querying:
+            self.querying.add(plot)
+            now = time.time()
+            self.queries.put((plot, stream, now - self.range, now, self.controller.station))
+        self.after(interval, self.animate, plot, stream, interval, time.monotonic() + interval / 1000)
+
+    def run_queries(self):
+        # the query may go over the network, so it never runs on the Tk thread
+        while True:
+            plot, stream, start, end, station = self.queries.get()
+            name = '_'.join(stream)
+            series = None
+            try:
+                with metrics.timer('query', plot=name):
+                    series = client.query(*stream, start, end, PLOT_POINTS, station)
+            except Exception:
+                # a failed frame is skipped, the plot keeps animating
+                metrics.count('animate_errors', plot=name)
+                traceback.print_exc()
+            self.controller.dispatcher.post(('plot', name), self.redraw, plot, name, series)
+
+    def redraw(self, plot, name, series):
+        self.querying.discard(plot)
+        if series is None or self.controller.current_frame is not self:
+            return
+        with metrics.timer('redraw', plot=name):
+            plot.update(*series)
 
-        canvas = FigureCanvasTkAgg(figureOPT, self)
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.36, rely=0.5)
+    def update_range(self, event):
+        range_name = self.range_box.get()
+        self.range = graph_ranges[range_name]
+        self.title.config(text=f"Očitanja senzora u proteklih {range_name}")
+        for plot in self.plots:
+            plot.set_window(self.range)
 
-        canvas = FigureCanvasTkAgg(figurePressure, self)
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.64, rely=0.5)
+    def update_station(self):
+        for plot in self.plots:
+            plot.set_window(self.range)
 
     def update_time(self):
-        time_label = tk.Label(self, text=datetime.now().strftime("%H:%M"), font=MEDIUM_FONT)
-        time_label.place(relx=0.875, rely=0.04375)
-        time_label.after(1500, time_label.destroy)
+        self.clock.set(datetime.now().strftime("%H:%M"))
 
 
 class Application(tk.Tk):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, overlay=False, render_worker=False, **kwargs):
         tk.Tk.__init__(self, *args, **kwargs)
 
         tk.Tk.wm_title(self, APP_NAME)
 
-        container = tk.Frame(self)
-        container.pack(side="top", fill="both", expand=True)
-        container.grid_rowconfigure(0, weight=1)
-        container.grid_columnconfigure(0, weight=1)
+        self.container = tk.Frame(self)
+        self.container.pack(side="top", fill="both", expand=True)
+        self.container.grid_rowconfigure(0, weight=1)
+        self.container.grid_columnconfigure(0, weight=1)
 
         self.frames = {}
-
-        for F in [MainView, GraphView]:
-            frame = F(container, self)
-
-            self.frames[F] = frame
-
-            frame.grid(row=0, column=0, sticky="nsew")
+        self.current_frame = None
+        self.station = service.PRIMARY
+        # the station list and settings come from the process that runs the service
+        data = client.snapshot()
+        self.stations = [service.PRIMARY] if data is None else data['stations']
+        self.settings = service.station_settings() if data is None else data['settings']
+        self.overlay = BoundLabel(self, ("Courier", 10), 0.005, 0.97) if overlay else None
+        self.render_worker = render_worker
 
         self.show_frame(MainView)
+        self.dispatcher = Dispatcher(self)
 
     def show_frame(self, cont):
+        # frames are built the first time they are shown
+        if cont not in self.frames:
+            with metrics.timer('build_frame', frame=cont.__name__):
+                frame = cont(self.container, self)
+                frame.grid(row=0, column=0, sticky="nsew")
+            self.frames[cont] = frame
+            # a newly built frame covers the overlay until it is raised again
+            if self.overlay is not None:
+                self.overlay.label.lift()
         frame = self.frames[cont]
         frame.tkraise()
-
-    def refresh_labels(self):
-        self.frames[MainView].update_data()
-        self.frames[MainView].check_actions()
-        self.frames[MainView].update_time()
-        self.frames[GraphView].update_time()
-
-
-def call_repeatedly(interval, func, *args):
-    stopped = threading.Event()
-
-    def loop():
-        while not stopped.wait(interval):
-            func(*args)
-
-    threading.Thread(target=loop).start()
-    return stopped.set
-
-
-def thread_gui():
-    app = Application()
-    app.geometry(f"{WINDOW_X}x{WINDOW_Y}")
-    aniOPT = animation.FuncAnimation(figureOPT, animateOPT, interval=LIGHT_INTERVAL)
-    aniPressure = animation.FuncAnimation(figurePressure, animatePressure, interval=PRESSURE_INTERVAL)
-    aniHumidity = animation.FuncAnimation(figureHumidity, animateHumidity, interval=HUMIDITY_INTERVAL)
-    aniTMP116 = animation.FuncAnimation(figureTMP116, animateTMP116, interval=TEMPERATURE_INTERVAL)
-    aniHDC2010_TMP = animation.FuncAnimation(figureHDC2010TMP, animateHDC2010TMP, interval=TEMPERATURE_INTERVAL)
-    aniDPS310_TMP = animation.FuncAnimation(figureDPS310TMP, animateDPS310TMP, interval=TEMPERATURE_INTERVAL)
-
-    def thread_update():
-        stop_refresh_labels = call_repeatedly(1, app.refresh_labels)
-        if serial_status:
-            stop_write_serial = call_repeatedly(0.25, write_serial)
-
-    update_thread = threading.Thread(target=thread_update, name="update", daemon=True)
-    update_thread.start()
-    app.mainloop()
-    sys.exit()
+        self.current_frame = frame
+
+    def select_station(self, station):
+        # None shows the summary of all stations, graphs then stay on the first one
+        self.station = station
+        if GraphView in self.frames:
+            self.frames[GraphView].update_station()
+
+    def post_refresh(self):
+        # runs on a worker thread, the snapshot may come over the network
+        data = client.summary() if self.station is None else client.snapshot(self.station)
+        self.dispatcher.post('refresh', self.refresh_labels, data)
+
+    def refresh_labels(self, data):
+        if data is not None:
+            self.frames[MainView].update_data(data)
+        for frame in self.frames.values():
+            frame.update_time()
+        if self.overlay is not None:
+            self.overlay.set(self.overlay_text(data))
+
+    def overlay_text(self, data):
+        stats = self.dispatcher.stats()
+        frame, lag = stats['frame_time']['last'], stats['queue_lag']['last']
+        missed = metrics.total('animate_missed')
+        text = (f"okvir {0 if frame is None else frame * 1000:.1f} ms, red {0 if lag is None else lag * 1000:.0f} ms, "
+                f"prekoračenja {stats['overruns']}, propuštene slike {missed}")
+        ingest = None if data is None else data.get('ingest')
+        if ingest:
+            text += f" | {ingest['lines_per_second']:.1f} uzoraka/s, red očitanja {ingest['queue_depth']}"
+        connection = None if data is None else data.get('connection')
+        if connection:
+            text += f" | veza {connection['uptime']:.0f} s, ponovnih spajanja {connection['reconnects']}"
+        return text
+
+
+def wait_first_sample(stamps):
+    service.first_sample.wait()
+    stamps['first_sample'] = time.time()
+
+
+def report_startup(app, stamps, deadline):
+    # absolute times, benchmarks/startup_benchmark.py knows when it launched the process
+    if 'first_paint' not in stamps:
+        app.update()
+        stamps['first_paint'] = time.time()
+        started = time.perf_counter()
+        app.show_frame(GraphView)
+        app.update()
+        stamps['graph_view'] = time.perf_counter() - started
+        app.show_frame(MainView)
+    if 'first_sample' not in stamps and time.time() < deadline:
+        app.after(10, report_startup, app, stamps, deadline)
+        return
+    print(json.dumps(stamps))
+    app.destroy()
 
 
 if __name__ == '__main__':
-    check_serial()
-    file_check()
-
-    if serial_status:
+    parser = argparse.ArgumentParser(description=APP_NAME)
+    parser.add_argument('--attach', action='store_true',
+                        help="spoji se na pokrenuti servis (service.py) umjesto vlastitog očitavanja")
+    parser.add_argument('--ui-stats', type=float, metavar='SEKUNDE',
+                        help="svakih N sekundi ispiši trajanje iscrtavanja i kašnjenje reda")
+    parser.add_argument('--overlay', action='store_true', help="prikaži mjerne podatke performansi u prozoru")
+    parser.add_argument('--profile', type=float, metavar='SEKUNDE',
+                        help="uzorkuj stogove svih dretvi N sekundi i spremi ih za flamegraph")
+    parser.add_argument('--render-worker', action='store_true',
+                        help="iscrtavaj grafove u zasebnom procesu, prozor samo prikazuje gotove slike")
+    parser.add_argument('--startup-report', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        metrics.profile(args.profile)
+
+    stamps = {}
+    if args.attach:
+        client = RemoteClient(service.SERVICE_PORT)
+        # the service already serves its own metrics on the configured port
         try:
-            serial_connection = serial.Serial(serial_port, baud_rate, timeout=1)
-            serial_connection.reset_input_buffer()
-        except:
-            print("Uspostavljanje komunikacije neuspješno: provjerite vezu")
-            serial_status = False
-
-    gui_thread = threading.Thread(target=thread_gui, name="gui", daemon=True)
-    gui_thread.start()
-
-    while gui_thread.is_alive():
-        time.sleep(0.5)
-        if serial_status:
-            if serial_connection.isOpen():
-                read_serial()
-                clean_buffer(csv_files)
+            metrics.serve(service.UI_METRICS_PORT)
+        except OSError as error:
+            # without its metrics the window still works
+            print(f"mjerni podaci sučelja isključeni: {error}", file=sys.stderr)
+    else:
+        if args.startup_report:
+            threading.Thread(target=wait_first_sample, args=(stamps,), daemon=True).start()
+        service.setup()
+        # acquisition runs alongside building the window instead of before it
+        threading.Thread(target=service.run, name="acquire", daemon=True).start()
+        client = LocalClient()
+        metrics.serve(service.METRICS_PORT)
+        service.serve_push(service.PUSH_PORT)
+
+    app = Application(overlay=args.overlay, render_worker=args.render_worker)
+    app.geometry(f"{WINDOW_X}x{WINDOW_Y}")
+    service.call_repeatedly(1, app.post_refresh)
+    if args.ui_stats:
+        service.call_repeatedly(args.ui_stats, lambda: print(json.dumps(app.dispatcher.stats())))
+    if args.startup_report:
+        app.after_idle(report_startup, app, stamps, time.time() + (0 if args.attach else 30))
+    app.mainloop()
 
     sys.exit()
@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import binlog
+import metrics
+from writer import repair_tail
+
+TIERS = [60, 900, 3600]
+TIER = np.dtype([('time', '<f8'), ('min', '<f4'), ('mean', '<f4'), ('max', '<f4'), ('count', '<u4')])
+# samples may reach the store a little after they were taken
+LAG = 5
+# cached decimations, one for every window length and resolution asked for recently
+DECIMATORS = 16
+
+
+def rollup(times, mins, means, maxs, counts, width):
+    buckets = np.floor(times / width) * width
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    total = np.add.reduceat(counts, starts)
+
+    records = np.empty(len(starts), dtype=TIER)
+    records['time'] = buckets[starts]
+    records['min'] = np.minimum.reduceat(mins, starts)
+    records['mean'] = np.add.reduceat(means * counts, starts) / total
+    records['max'] = np.maximum.reduceat(maxs, starts)
+    records['count'] = total
+    return records
+
+
+def extremes(values, starts):
+    # index of the first minimum and the first maximum of every bucket, in order
+    buckets = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    lows = np.minimum.reduceat(values, starts)[buckets] == values
+    highs = np.maximum.reduceat(values, starts)[buckets] == values
+    low_index = np.flatnonzero(lows)[np.unique(buckets[lows], return_index=True)[1]]
+    high_index = np.flatnonzero(highs)[np.unique(buckets[highs], return_index=True)[1]]
+    return np.unique(np.concatenate((low_index, high_index)))
+
+
+def decimate(times, values, max_points):
+    # the lowest and the highest sample of every bucket survive, so spikes stay visible
+    if max_points is None or len(times) <= max_points:
+        return times, values
+    edges = np.linspace(times[0], times[-1], max(1, max_points // 2) + 1)
+    keep = extremes(values, np.unique(np.searchsorted(times, edges[:-1])))
+    return times[keep], values[keep]
+
+
+class Decimator:
+    def __init__(self, width):
+        # buckets are aligned to whole multiples of the width, so a bucket keeps
+        # its samples while the window scrolls and only has to be reduced once
+        self.width = width
+        self.times = np.empty(0)
+        self.values = np.empty(0)
+        self.buckets = np.empty(0)
+        # index of the newest bucket, it can still grow and is not cached
+        self.closed = None
+        # bucket cut by the start of the previous window, older buckets are no longer cached
+        self.lead = None
+        self.lock = threading.Lock()
+
+    def reduce(self, times, values):
+        buckets = np.floor(times / self.width)
+        if len(times) == 0:
+            return times, values, buckets
+        keep = extremes(values, np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1]))))
+        return times[keep], values[keep], buckets[keep]
+
+    def update(self, buffer, start, end):
+        with self.lock:
+            lead = np.floor(start / self.width)
+            # callers take their own now, a window may start a little before the previous one
+            if self.closed is not None and (not lead < self.closed <= np.floor(end / self.width) or lead < self.lead):
+                self.times, self.values, self.buckets, self.closed = np.empty(0), np.empty(0), np.empty(0), None
+
+            # the bucket cut by the window edge is reduced again from the samples still inside it
+            times, values = buffer.window(start, min(end, (lead + 1) * self.width))
+            inside = np.floor(times / self.width) == lead
+            lead_times, lead_values, _ = self.reduce(times[inside], values[inside])
+
+            # fetched with some margin, membership is decided by the bucket index alone
+            first = lead + 1 if self.closed is None else self.closed
+            times, values = buffer.window((first - 0.5) * self.width, end)
+            inside = np.floor(times / self.width) >= first
+            times, values, buckets = self.reduce(times[inside], values[inside])
+            if len(times) > 0:
+                self.closed = buckets[-1]
+                done = buckets < self.closed
+                self.times = np.concatenate((self.times, times[done]))
+                self.values = np.concatenate((self.values, values[done]))
+                self.buckets = np.concatenate((self.buckets, buckets[done]))
+                times, values = times[~done], values[~done]
+
+            self.lead = lead
+            cached = int(np.searchsorted(self.buckets, lead, 'right'))
+            self.times, self.values, self.buckets = self.times[cached:], self.values[cached:], self.buckets[cached:]
+            return np.concatenate((lead_times, self.times, times)), np.concatenate((lead_values, self.values, values))
+
+
+class Archive:
+    def __init__(self, streams, folder, store, live_windows, max_points=2000):
+        self.streams = streams
+        self.folder = folder
+        self.store = store
+        self.live_windows = live_windows
+        self.max_points = max_points
+        self.lock = threading.Lock()
+        self.done = {}
+        self.decimators = {}
+
+    def path(self, key, width):
+        name = os.path.splitext(os.path.basename(key))[0]
+        return os.path.join(self.folder, f"{name}_{width}.bin")
+
+    def load(self):
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+
+        for key, (sensor, quantity) in self.streams.items():
+            for width in TIERS:
+                path = self.path(key, width)
+                binlog.create(path, sensor, quantity)
+                # a record torn by a crash would shift every later one in the map
+                repair_tail(path, binlog.HEADER_SIZE, TIER.itemsize)
+                records = binlog.open_records(path, TIER)
+                self.done[key, width] = records['time'][-1] + width if len(records) else 0
+
+    def records(self, key, width, start=None, end=None):
+        records = binlog.open_records(self.path(key, width), TIER)
+        times = records['time']
+        first = 0 if start is None else int(np.searchsorted(times, start))
+        last = len(times) if end is None else int(np.searchsorted(times, end))
+        return records[first:last]
+
+    def compact(self, now):
+        with self.lock:
+            for key in self.streams:
+                for i, width in enumerate(TIERS):
+                    limit = np.floor((now - LAG) / width) * width
+                    done = self.done[key, width]
+                    if limit <= done:
+                        continue
+
+                    if i == 0:
+                        times, values = self.store[key].window(done)
+                        complete = times < limit
+                        times, values = times[complete], values[complete]
+                        source = (times, values, values, values, np.ones(len(values), dtype=np.uint32))
+                    else:
+                        records = self.records(key, TIERS[i - 1], done, limit)
+                        source = (records['time'], records['min'], records['mean'], records['max'],
+                                  records['count'])
+
+                    if len(source[0]) > 0:
+                        with open(self.path(key, width), 'ab') as file:
+                            file.write(rollup(*source, width).tobytes())
+                    self.done[key, width] = limit
+
+    def decimated(self, key, start, end, max_points):
+        # a live window is reduced incrementally, longer ranges come from the tiers
+        span = end - start
+        if max_points is None or span > self.live_windows[key]:
+            times, minimums, means, maximums = self.query(key, start, end)
+            return decimate(times, means, max_points)
+
+        # a window never touches more buckets than max_points has room for
+        width = (round(span) + 1) / max(1, max_points // 2 - 1)
+        decimator = self.decimators.get((key, width))
+        if decimator is None:
+            if len(self.decimators) >= DECIMATORS:
+                self.decimators.pop(next(iter(self.decimators)), None)
+            decimator = self.decimators.setdefault((key, width), Decimator(width))
+        return decimator.update(self.store[key], start, end)
+
+    def query(self, key, start, end):
+        span = end - start
+        if span <= self.live_windows[key]:
+            times, values = self.store[key].window(start, end)
+            return times, values, values, values
+
+        tiers = [width for width in TIERS if span / width <= self.max_points] or TIERS[-1:]
+        parts = []
+        cursor = start
+        # the coarsest fitting tier covers most of the range, finer tiers and
+        # the raw samples fill in the buckets it has not rolled up yet
+        for width in reversed(TIERS[:TIERS.index(tiers[0]) + 1]):
+            records = self.records(key, width, cursor, end)
+            if len(records) > 0:
+                parts.append((records['time'] + width / 2, records['min'], records['mean'], records['max']))
+                cursor = records['time'][-1] + width
+
+        times, values = self.store[key].window(cursor, end)
+        parts.append((times, values, values, values))
+        return tuple(np.concatenate([part[column] for part in parts]) for column in range(4))
+
+
+class ArchiveCompactor(threading.Thread):
+    def __init__(self, archives, interval):
+        threading.Thread.__init__(self, name="archive", daemon=True)
+        self.archives = archives
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with metrics.timer('archive_compact'):
+                for archive in self.archives:
+                    archive.compact(time.time())
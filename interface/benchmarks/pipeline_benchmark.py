@@ -0,0 +1,205 @@
+import argparse
+import configparser
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+INTERFACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERFACE)
+
+import matplotlib
+
+matplotlib.use('Agg')
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from memory import rss
+from readings import format_time
+from simulator import PERIODS, SimulatedStation, loopback_pair, synthetic_samples, synthetic_value
+from streams import load_streams
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_baseline.json')
+SPEEDS = [1, 10, 100]
+# station seconds covered by one acquire() pass of the main loop
+TICK = 0.5
+STAGES = ['read_serial', 'clean_buffer', 'update_readings', 'check_pressure', 'update_data', 'animate']
+# p95 changes below this many milliseconds are noise, not regressions
+NOISE_FLOOR = 0.05
+# two points per pixel column of a 7 inch figure at 60 DPI, as GraphView asks for
+PLOT_POINTS = 7 * 60 * 2
+
+
+def write_config(folder, protocol='auto', speed=1, port='SIM'):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(INTERFACE, 'config.ini'), encoding='utf-8')
+    config.set('default', 'port', port)
+    config.set('default', 'readings_folder', os.path.join(folder, 'readings', ''))
+    config.set('default', 'archive_folder', os.path.join(folder, 'archive', ''))
+    config.set('default', 'serial_protocol', protocol)
+    # the store is sized from the nominal sample rates, a faster station needs proportionally more room
+    config.set('default', 'rate_headroom', str(2 * speed))
+    with open(os.path.join(folder, 'config.ini'), 'w', encoding='utf-8') as configfile:
+        config.write(configfile)
+    return config
+
+
+def prefill(config, speed):
+    # a full live window of history so the buffers are as large as in steady state
+    window = int(config['default']['buffer_window']) * 60
+    now = datetime.now().timestamp()
+    folder = config['default']['readings_folder']
+    os.makedirs(folder, exist_ok=True)
+    for (sensor, quantity), stream in load_streams(config).items():
+        times = np.arange(now - window, now, PERIODS[sensor, quantity] / speed)
+        with open(folder + stream.file, 'w') as file:
+            file.writelines(f"{format_time(t)}, {sensor}, {quantity}, "
+                            f"{synthetic_value(quantity, t):.2f}\r\n" for t in times.tolist())
+
+
+def percentiles(samples):
+    values = np.array(samples) * 1000
+    return {'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95)),
+            'p99': float(np.percentile(values, 99)), 'max': float(values.max())}
+
+
+def timed(timings, stage, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    timings[stage].append(time.perf_counter() - started)
+    return result
+
+
+def worker(speed, ticks, protocol):
+    folder = tempfile.mkdtemp()
+    try:
+        config = write_config(folder, protocol, speed)
+        prefill(config, speed)
+        os.chdir(folder)
+        import service
+        from plots import LivePlot
+        from viewmodel import dashboard_texts, measurement_layout
+
+        service.setup()
+        layout = measurement_layout(service.streams.values())
+        station = service.stations[service.PRIMARY]
+        station.load()
+        host, device = loopback_pair()
+        service.serial_reader.start()
+        station.available = True
+        station.connection = host
+        station.reader = service.serial_reader.add(station.name, host)
+        simulated = SimulatedStation(device, synthetic_samples(), speed)
+        # the first actuator frame negotiates the protocol
+        station.update_controls()
+
+        window = int(service.BUFFER_LENGTH) * 60
+        plots = []
+        for stream in service.streams.values():
+            figure = Figure(figsize=(7, 5), dpi=60)
+            FigureCanvasAgg(figure)
+            plots.append((LivePlot(figure, stream.title, stream.unit, window, stream.scale), stream.key))
+
+        timings = {stage: [] for stage in STAGES}
+        started = time.perf_counter()
+        until = 0.0
+        for tick in range(ticks):
+            until += TICK * speed
+            simulated.advance(until)
+            # wait until the reader thread decoded everything the station sent
+            sent = simulated.sent - len(simulated.batch)
+            while station.reader.stats.lines < sent:
+                time.sleep(0.0005)
+
+            timed(timings, 'read_serial', service.read_serial)
+            timed(timings, 'clean_buffer', service.clean_buffer)
+            timed(timings, 'update_readings', station.update_readings)
+            timed(timings, 'check_pressure', station.check_pressure)
+            timed(timings, 'update_data', lambda: dashboard_texts(service.snapshot(), layout))
+
+            now = time.time()
+            timed(timings, 'animate', lambda: [plot.update(*service.query(*stream, now - window, now, PLOT_POINTS))
+                                               for plot, stream in plots])
+        elapsed = time.perf_counter() - started
+
+        return {
+            'speed': speed,
+            'protocol': station.reader.stats.snapshot()['protocol'],
+            'samples': station.reader.stats.lines,
+            'throughput': station.reader.stats.lines / elapsed,
+            'rss_mib': rss() / 2 ** 20,
+            'stages': {stage: percentiles(samples) for stage, samples in timings.items()},
+        }
+    finally:
+        os.chdir(INTERFACE)
+        shutil.rmtree(folder)
+
+
+def regressions(result, baseline, tolerance):
+    found = []
+    for speed, run in result.items():
+        base = baseline.get(speed)
+        if base is None:
+            continue
+        if run['throughput'] < base['throughput'] / (1 + tolerance):
+            found.append(f"{speed}x throughput {run['throughput']:.0f} < {base['throughput']:.0f}")
+        if run['rss_mib'] > base['rss_mib'] * (1 + tolerance):
+            found.append(f"{speed}x RSS {run['rss_mib']:.1f} MiB > {base['rss_mib']:.1f} MiB")
+        for stage, stats in run['stages'].items():
+            limit = base['stages'][stage]['p95']
+            if stats['p95'] > limit * (1 + tolerance) and stats['p95'] - limit > NOISE_FLOOR:
+                found.append(f"{speed}x {stage} p95 {stats['p95']:.3f} ms > {limit:.3f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="read_serial, clean_buffer, check_pressure, update_data and "
+                                                 "animate driven by a simulated station")
+    parser.add_argument('--speeds', type=int, nargs='+', default=SPEEDS)
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--protocol', choices=['text', 'auto'], default='auto')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(worker(args.worker, args.ticks, args.protocol)))
+        return
+
+    # every speed runs in its own process, so memory and module state do not carry over
+    result = {}
+    for speed in args.speeds:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(speed),
+                                 '--ticks', str(args.ticks), '--protocol', args.protocol],
+                                check=True, capture_output=True, text=True).stdout
+        result[str(speed)] = json.loads(output)
+
+    print(f"{'speed':>6} {'stage':>16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for speed, run in result.items():
+        for stage, stats in run['stages'].items():
+            print(f"{speed + 'x':>6} {stage:>16} {stats['p50']:>9.3f} {stats['p95']:>9.3f} "
+                  f"{stats['p99']:>9.3f} {stats['max']:>9.3f}")
+        print(f"{speed + 'x':>6} {run['protocol']} {run['samples']} samples, {run['throughput']:.0f} samples/s, "
+              f"{run['rss_mib']:.1f} MiB RSS")
+
+    if args.save_baseline:
+        with open(BASELINE, 'w') as file:
+            json.dump(result, file, indent=2)
+        return
+
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            found = regressions(result, json.load(file), args.tolerance)
+        for regression in found:
+            print("REGRESSION", regression)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
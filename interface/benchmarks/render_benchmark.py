@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+INTERFACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERFACE)
+
+import matplotlib
+
+matplotlib.use('Agg')
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from pipeline_benchmark import PLOT_POINTS, percentiles, prefill, write_config
+from simulator import PtyPort, SimulatedStation, synthetic_samples
+from streams import MIN_REFRESH
+
+MODES = ['inline', 'worker']
+FIGURE_SIZE = (7, 5)
+DPI = 60
+
+
+class LoggedPort(PtyPort):
+    def __init__(self):
+        PtyPort.__init__(self)
+        self.total = 0
+        self.log = []
+
+    def write(self, data):
+        started = time.monotonic()
+        written = PtyPort.write(self, data)
+        self.total += written
+        self.log.append((started, self.total))
+        return written
+
+
+class TimedConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.total = 0
+        self.log = []
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def read(self, size=1):
+        data = self.connection.read(size)
+        self.total += len(data)
+        self.log.append((time.monotonic(), self.total))
+        return data
+
+
+def ingest_latency(sent, received):
+    # every write counts as arrived once the reader has read past its last byte
+    sent_times, sent_ends = np.array(sent).T
+    read_times, read_ends = np.array(received).T
+    index = np.searchsorted(read_ends, sent_ends)
+    arrived = index < len(read_ends)
+    return read_times[index[arrived]] - sent_times[arrived]
+
+
+def worker(mode, seconds, speed, interval, protocol):
+    folder = tempfile.mkdtemp()
+    port = LoggedPort()
+    stopped = threading.Event()
+    try:
+        config = write_config(folder, protocol, speed, port.name)
+        prefill(config, 1)
+        os.chdir(folder)
+        import service
+
+        service.setup()
+        station = service.stations[service.PRIMARY]
+        service.serial_reader.start()
+        service.connect(station)
+        connection = TimedConnection(station.connection)
+        station.reader.connection = connection
+        station.load()
+        station.update_controls()
+
+        def acquire():
+            while not stopped.is_set():
+                service.acquire()
+
+        simulated = SimulatedStation(port, synthetic_samples(), speed)
+        threading.Thread(target=simulated.run, args=(stopped,), daemon=True).start()
+        threading.Thread(target=acquire, daemon=True).start()
+
+        window = int(service.BUFFER_LENGTH) * 60
+        plotted = [stream for stream in service.streams.values() if stream.plot is not None]
+        rendered = []
+        if mode == 'worker':
+            from render import RenderWorker
+
+            free = [True] * len(plotted)
+
+            def done(index):
+                free[index] = True
+                rendered.append(index)
+
+            renderer = RenderWorker(len(plotted), FIGURE_SIZE, DPI, PLOT_POINTS)
+            for stream in plotted:
+                renderer.add(stream.title, stream.unit, window, stream.scale, done)
+        else:
+            from plots import LivePlot
+
+            plots = []
+            for stream in plotted:
+                figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+                FigureCanvasAgg(figure)
+                plots.append(LivePlot(figure, stream.title, stream.unit, window, stream.scale))
+
+        # the first second negotiates the protocol and fills the queue, it is not measured
+        time.sleep(1)
+        skip_sent, skip_read = len(port.log), len(connection.log)
+        frames = []
+        started = time.monotonic()
+        while time.monotonic() - started < seconds:
+            frame_started = time.perf_counter()
+            now = time.time()
+            for index, stream in enumerate(plotted):
+                series = service.query(*stream.key, now - window, now, PLOT_POINTS)
+                if mode == 'worker':
+                    if free[index]:
+                        free[index] = False
+                        renderer.submit(index, *series, window)
+                else:
+                    plots[index].update(*series)
+                    rendered.append(index)
+            frames.append(time.perf_counter() - frame_started)
+            time.sleep(max(0.0, interval - (time.perf_counter() - frame_started)))
+        elapsed = time.monotonic() - started
+        stopped.set()
+
+        latency = ingest_latency(port.log[skip_sent:], connection.log[skip_read:])
+        if mode == 'worker':
+            renderer.close()
+        return {
+            'mode': mode,
+            'writes': len(latency),
+            'renders_per_second': len(rendered) / elapsed,
+            'ingest_latency': percentiles(latency),
+            'ui_frame': percentiles(frames),
+        }
+    finally:
+        stopped.set()
+        os.chdir(INTERFACE)
+        port.close()
+        shutil.rmtree(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="delay from the station writing a frame to the reader thread "
+                                                 "reading it, with the charts rendered inline or in a worker process")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--speed', type=float, default=10)
+    parser.add_argument('--interval', type=float, default=MIN_REFRESH / 1000,
+                        help="seconds between two redraws of every chart")
+    # a text station writes every sample on its own, binary frames batch them
+    parser.add_argument('--protocol', choices=['text', 'auto'], default='text')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(worker(args.worker, args.seconds, args.speed, args.interval, args.protocol)))
+        return
+
+    print(f"{'mode':>7} {'stage':>15} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for mode in args.modes:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', mode,
+                                 '--seconds', str(args.seconds), '--speed', str(args.speed),
+                                 '--interval', str(args.interval), '--protocol', args.protocol],
+                                check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.splitlines()[-1])
+        for stage in ['ingest_latency', 'ui_frame']:
+            stats = run[stage]
+            print(f"{mode:>7} {stage:>15} {stats['p50']:>9.3f} {stats['p95']:>9.3f} "
+                  f"{stats['p99']:>9.3f} {stats['max']:>9.3f}")
+        print(f"{mode:>7} {run['writes']} station writes, {run['renders_per_second']:.1f} renders/s")
+
+
+if __name__ == '__main__':
+    main()
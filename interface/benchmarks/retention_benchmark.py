@@ -0,0 +1,125 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from readings import TIME_FORMAT, format_time
+from retention import Retention
+
+# nominal sample rates of sensor_station.ino in samples per second
+STREAMS = {
+    'TMP116.csv': ('TMP116', 'T', 0.2),
+    'OPT3001.csv': ('OPT3001', 'L', 1),
+    'HDC2010_HUM.csv': ('HDC2010', 'H', 0.2),
+    'HDC2010_TEMP.csv': ('HDC2010', 'T', 0.2),
+    'DPS310_PRES.csv': ('DPS310', 'P', 4),
+    'DPS310_TEMP.csv': ('DPS310', 'T', 0.2),
+}
+TICK = 0.5
+
+
+def legacy_clean_buffer(filelist, buffer_length, now):
+    for file in filelist:
+        with open(file, 'r') as buffer:
+            valid = []
+            lines = buffer.readlines()
+            if len(lines) > 0:
+                for row in lines:
+                    timestamp = datetime.strptime(row.split(", ")[0], TIME_FORMAT)
+                    time_diff = now - timestamp
+                    if int(buffer_length) * 60 >= time_diff.total_seconds() >= 0:
+                        valid.append(row)
+        buffer.close()
+
+        with open(file, 'w') as buffer:
+            buffer.writelines(valid)
+        buffer.close()
+
+
+def sample_lines(name, start, end):
+    sensor, quantity, rate = STREAMS[name]
+    first = int(start * rate) + 1
+    last = int(end * rate)
+    for n in range(first, last + 1):
+        timestamp = n / rate
+        text = format_time(timestamp) + f", {sensor}, {quantity}, 21.37\n"
+        yield timestamp, text
+
+
+def fill(folder, window, now):
+    for name in STREAMS:
+        with open(os.path.join(folder, name), 'w', newline='') as file:
+            file.writelines(text for _, text in sample_lines(name, now - window * 60, now))
+
+
+def append(folder, start, end, retention=None):
+    for name in STREAMS:
+        path = os.path.join(folder, name)
+        with open(path, 'a', newline='') as file:
+            for timestamp, text in sample_lines(name, start, end):
+                file.write(text)
+                if retention is not None:
+                    retention.appended(path, timestamp, len(text.encode()))
+
+
+def run(window, ticks, engine):
+    folder = tempfile.mkdtemp()
+    try:
+        now = float(int(datetime.now().timestamp()))
+        files = [os.path.join(folder, name) for name in STREAMS]
+        fill(folder, window, now)
+
+        retention = None
+        if engine:
+            retention = Retention({file: window * 60 for file in files})
+            retention.load()
+
+        elapsed = 0
+        written = 0
+        for _ in range(ticks):
+            append(folder, now, now + TICK, retention)
+            now += TICK
+            started = time.perf_counter()
+            if engine:
+                retention.expire(now)
+            else:
+                legacy_clean_buffer(files, window, datetime.fromtimestamp(now))
+                written += sum(os.path.getsize(file) for file in files)
+            elapsed += time.perf_counter() - started
+
+        if not engine:
+            return elapsed / ticks, written / ticks
+
+        # a compaction rewrites the live half of each file once per half window,
+        # so time one and spread it over the ticks in between
+        started = time.perf_counter()
+        retention.expire(now + window * 30)
+        compaction = time.perf_counter() - started
+        written = sum(log.compacted_bytes for log in retention.logs.values())
+        interval = window * 30 / TICK
+        return elapsed / ticks + compaction / interval, written / interval
+    finally:
+        shutil.rmtree(folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="clean_buffer vs. Retention")
+    parser.add_argument('--windows', type=int, nargs='+', default=[10, 60, 1440])
+    parser.add_argument('--ticks', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'window':>8} {'engine':>10} {'ms/tick':>10} {'written B/tick':>15}")
+    for window in args.windows:
+        for engine in (False, True):
+            tick_time, written = run(window, args.ticks, engine)
+            print(f"{window:>8} {'retention' if engine else 'legacy':>10} "
+                  f"{tick_time * 1000:>10.3f} {written:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+INTERFACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERFACE)
+
+from pipeline_benchmark import prefill, write_config
+from simulator import PtyPort, SimulatedStation, synthetic_samples
+
+STAMPS = ['first_sample', 'first_paint']
+
+
+def launch(folder):
+    started = time.time()
+    output = subprocess.run([sys.executable, os.path.join(INTERFACE, 'application.py'), '--startup-report'],
+                            cwd=folder, check=True, capture_output=True, text=True).stdout
+    stamps = json.loads(output.splitlines()[-1])
+    result = {stamp: (stamps[stamp] - started) * 1000 if stamp in stamps else None for stamp in STAMPS}
+    result['graph_view'] = stamps['graph_view'] * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="time from launching application.py to the first sample, "
+                                                 "the first paint and the first graph view")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--history', type=int, default=1, help="speed of the prefilled history, 0 for none")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    port = PtyPort()
+    stopped = threading.Event()
+    try:
+        config = write_config(folder, port=port.name)
+        if args.history:
+            prefill(config, args.history)
+        simulated = SimulatedStation(port, synthetic_samples(), speed=10)
+        threading.Thread(target=simulated.run, args=(stopped,), daemon=True).start()
+
+        runs = [launch(folder) for run in range(args.runs)]
+    finally:
+        stopped.set()
+        port.close()
+        shutil.rmtree(folder)
+
+    print(f"{'stage':>14} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for stage in STAMPS + ['graph_view']:
+        values = [run[stage] for run in runs if run[stage] is not None]
+        if not values:
+            print(f"{stage:>14} {'-':>10}")
+            continue
+        print(f"{stage:>14} {statistics.median(values):>10.0f} {min(values):>10.0f} {max(values):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
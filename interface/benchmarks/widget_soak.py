@@ -0,0 +1,79 @@
+import argparse
+import math
+import os
+import sys
+import time
+
+INTERFACE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INTERFACE)
+os.chdir(INTERFACE)
+
+import numpy as np
+
+import application
+from memory import rss
+
+
+class SimulatedClient:
+    def __init__(self):
+        self.second = 0
+        self.settings = {'light_threshold': 150, 'temperature_comfort_low': 22, 'temperature_comfort_high': 24,
+                         'humidity_comfort_low': 40, 'humidity_comfort_high': 60, 'port': 'COM10', 'baud': 9600}
+
+    def snapshot(self, station=None):
+        second = self.second
+        self.second += 1
+        day = 2 * math.pi * second / 86400
+        temperature = round(23 + 2 * math.sin(day), 1)
+        humidity = round(50 + 15 * math.sin(day * 3))
+        light = round(max(0, 400 * math.sin(day)))
+        return {
+            'readings': {'T': temperature, 'H': humidity, 'P': round(1013 + math.sin(day * 5), 1), 'L': light},
+            'comfort': {'T': 'ok' if 24 > temperature > 22 else 'high' if temperature >= 24 else 'low',
+                        'H': 'ok' if 60 > humidity > 40 else 'high' if humidity >= 60 else 'low',
+                        'L': 'dark' if light <= 150 else 'ok'},
+            'control': {},
+            'open_timestamp': time.strftime("%H:%M", time.gmtime(second // 3600 * 3600)),
+            'serial_status': second % 7200 > 60,
+            'serial_open': second % 7200 > 120,
+            'station': application.service.PRIMARY,
+            'stations': [application.service.PRIMARY],
+            'settings': self.settings,
+        }
+
+    def query(self, sensor, quantity, start, end, max_points=None, station=None):
+        return np.empty(0), np.empty(0)
+
+    def update_settings(self, settings, station=None):
+        self.settings.update(settings)
+
+
+def widget_count(widget):
+    return 1 + sum(widget_count(child) for child in widget.winfo_children())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="broj widgeta i RSS kroz simulirana 24 sata osvježavanja")
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--report', type=int, default=3600, help="ispis svakih N simuliranih sekundi")
+    args = parser.parse_args()
+
+    application.client = SimulatedClient()
+    app = application.Application()
+    app.update()
+
+    print(f"{'hours':>6} {'widgets':>8} {'rss MiB':>9} {'ms/tick':>8}")
+    started = time.perf_counter()
+    for second in range(int(args.hours * 3600) + 1):
+        app.refresh_labels(application.client.snapshot())
+        app.update_idletasks()
+        if second % args.report == 0:
+            elapsed = time.perf_counter() - started
+            print(f"{second / 3600:>6.1f} {widget_count(app):>8} {rss() / 2 ** 20:>9.1f} "
+                  f"{elapsed * 1000 / args.report:>8.3f}")
+            started = time.perf_counter()
+    app.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+
+from readings import TIME_FORMAT, column_names, load_readings, to_datetime64, to_epoch
+
+MAGIC = b'RPMB'
+VERSION = 1
+HEADER = struct.Struct('<4sB16sc10x')
+HEADER_SIZE = HEADER.size
+RECORD = np.dtype([('time', '<f8'), ('value', '<f4')])
+RECORD_STRUCT = struct.Struct('<df')
+
+
+def pack_header(sensor, quantity):
+    return HEADER.pack(MAGIC, VERSION, sensor.encode(), quantity.encode())
+
+
+def read_header(path):
+    with open(path, 'rb') as file:
+        magic, version, sensor, quantity = HEADER.unpack(file.read(HEADER_SIZE))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} nije binarna datoteka očitanja")
+    return sensor.rstrip(b'\0').decode(), quantity.decode()
+
+
+def create(path, sensor, quantity):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, 'wb') as file:
+            file.write(pack_header(sensor, quantity))
+
+
+def pack(timestamp, value):
+    return RECORD_STRUCT.pack(timestamp, value)
+
+
+def open_records(path, dtype=RECORD):
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count <= 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def record_index(path):
+    records = open_records(path)
+    ends = HEADER_SIZE + RECORD.itemsize * np.arange(1, len(records) + 1)
+    return np.asarray(records['time']), ends
+
+
+def csv_to_binary(csv_path, bin_path):
+    import pandas as pd
+    data = pd.read_csv(csv_path, names=column_names, nrows=1)
+    if data.empty:
+        raise ValueError(f"{csv_path} nema očitanja")
+    sensor, quantity = data['Senzor'][0].strip(), data['Velicina'][0].strip()
+    times, values = load_readings(csv_path)
+
+    records = np.empty(len(times), dtype=RECORD)
+    records['time'] = to_epoch(times)
+    records['value'] = values
+    with open(bin_path, 'wb') as file:
+        file.write(pack_header(sensor, quantity))
+        file.write(records.tobytes())
+
+
+def binary_to_csv(bin_path, csv_path):
+    import pandas as pd
+    sensor, quantity = read_header(bin_path)
+    records = open_records(bin_path)
+
+    times = pd.Series(to_datetime64(records['time'])).dt.strftime(TIME_FORMAT).str[:-3]
+    lines = times + f", {sensor}, {quantity}, " + np.char.mod('%.2f', records['value']) + '\n'
+    with open(csv_path, 'w', newline='') as file:
+        file.write(''.join(lines))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pretvorba očitanja između CSV i binarnog formata")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        csv_to_binary(args.source, args.target)
+    else:
+        binary_to_csv(args.source, args.target)
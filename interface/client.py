@@ -0,0 +1,84 @@
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+import service
+from readings import format_time
+
+
+class LocalClient:
+    def snapshot(self, station=None):
+        return service.snapshot(station)
+
+    def summary(self):
+        return service.summary()
+
+    def query(self, sensor, quantity, start, end, max_points=None, station=None):
+        return service.query(sensor, quantity, start, end, max_points, station)
+
+    def update_settings(self, settings, station=None):
+        service.update_settings(settings, station)
+
+
+class RemoteClient:
+    def __init__(self, port, host='127.0.0.1', timeout=2):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def request(self, message):
+        with self.lock:
+            try:
+                if self.connection is None:
+                    self.connection = socket.create_connection(self.address, timeout=self.timeout).makefile('rwb')
+                self.connection.write(json.dumps(message).encode() + b'\n')
+                self.connection.flush()
+                response = json.loads(self.connection.readline())
+            except (OSError, ValueError):
+                if self.connection is not None:
+                    self.connection.close()
+                self.connection = None
+                return None
+        if isinstance(response, dict) and 'error' in response:
+            # the service could not answer, callers see the same as a lost connection
+            print(f"servis: {response['error']}", file=sys.stderr)
+            return None
+        return response
+
+    def snapshot(self, station=None):
+        return self.request({'cmd': 'snapshot', 'station': station})
+
+    def summary(self):
+        return self.request({'cmd': 'summary'})
+
+    def query(self, sensor, quantity, start, end, max_points=None, station=None):
+        response = self.request({'cmd': 'query', 'sensor': sensor, 'quantity': quantity, 'start': start, 'end': end,
+                                 'max_points': max_points, 'station': station})
+        if response is None:
+            return np.empty(0), np.empty(0)
+        return np.array(response['timestamps']), np.array(response['values'])
+
+    def update_settings(self, settings, station=None):
+        self.request({'cmd': 'settings', 'settings': settings, 'station': station})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Očitanja jedne veličine iz pokrenutog servisa")
+    parser.add_argument('sensor', help="npr. DPS310")
+    parser.add_argument('quantity', help="T, H, L ili P")
+    parser.add_argument('--minutes', type=float, default=60, help="raspon u minutama do sada")
+    parser.add_argument('--max-points', type=int, help="najveći broj točaka, veći raspon se prorjeđuje")
+    parser.add_argument('--station')
+    args = parser.parse_args()
+
+    end = time.time()
+    timestamps, values = RemoteClient(service.SERVICE_PORT).query(args.sensor, args.quantity, end - args.minutes * 60,
+                                                                   end, args.max_points, args.station)
+    for timestamp, value in zip(timestamps.tolist(), values.tolist()):
+        print(f"{format_time(timestamp)}, {value:.2f}")
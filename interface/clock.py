@@ -0,0 +1,87 @@
+from collections import deque
+
+WRAP = 2 ** 32
+# far beyond any crystal, only guards the fit against a badly spread first few windows
+MAX_DRIFT = 1e-3
+
+
+class DeviceClock:
+    def __init__(self, window=60, windows=30):
+        self.window = window
+        self.windows = deque(maxlen=windows)
+        self.raw = None
+        self.wraps = 0
+        self.resets = 0
+        self.last_wall = float('-inf')
+        self.offset = None
+        self.drift = 0.0
+        self.origin = 0.0
+
+    def reset(self):
+        self.windows.clear()
+        self.raw = None
+        self.wraps = 0
+        self.offset = None
+        self.drift = 0.0
+
+    def device_seconds(self, millis):
+        if self.raw is not None and millis < self.raw:
+            if self.raw - millis > WRAP // 2:
+                self.wraps += 1
+            else:
+                # millis went back without wrapping, the station restarted
+                self.resets += 1
+                self.reset()
+        self.raw = millis
+        return (self.wraps * WRAP + millis) / 1000
+
+    def observe(self, device, received):
+        # a sample can only arrive after it was taken, so the smallest
+        # received - device difference in each window is closest to the true offset
+        offset = received - device
+        start = device - device % self.window
+        if self.windows and self.windows[-1][0] == start:
+            if offset < self.windows[-1][2]:
+                self.windows[-1] = (start, device, offset)
+            else:
+                return
+        else:
+            self.windows.append((start, device, offset))
+        self.fit()
+
+    def fit(self):
+        if len(self.windows) < 2:
+            self.origin, self.offset, self.drift = self.windows[-1][1], self.windows[-1][2], 0.0
+            return
+        # least squares line through the window minima gives offset and drift
+        devices = [device for start, device, offset in self.windows]
+        offsets = [offset for start, device, offset in self.windows]
+        mean_device = sum(devices) / len(devices)
+        mean_offset = sum(offsets) / len(offsets)
+        spread = sum((device - mean_device) ** 2 for device in devices)
+        if spread == 0:
+            self.drift = 0.0
+        else:
+            self.drift = sum((device - mean_device) * (offset - mean_offset)
+                             for device, offset in zip(devices, offsets)) / spread
+        self.drift = max(-MAX_DRIFT, min(MAX_DRIFT, self.drift))
+        self.origin = mean_device
+        self.offset = mean_offset
+
+    def to_wall(self, millis, received):
+        device = self.device_seconds(millis)
+        self.observe(device, received)
+        wall = device + self.offset + self.drift * (device - self.origin)
+        # never ahead of the moment the sample arrived, never out of order
+        wall = max(min(wall, received), self.last_wall)
+        self.last_wall = wall
+        return wall
+
+    def snapshot(self):
+        return {
+            'offset': self.offset,
+            'drift_ppm': round(self.drift * 1e6, 2),
+            'windows': len(self.windows),
+            'wraps': self.wraps,
+            'resets': self.resets,
+        }
@@ -0,0 +1,113 @@
+import threading
+import time
+
+ACTUATORS = ['light', 'heating', 'cooling', 'humidifier']
+
+
+class Actuator:
+    def __init__(self, min_on, min_off):
+        self.min_on = min_on
+        self.min_off = min_off
+        self.state = 0
+        self.changed = float('-inf')
+
+    def set(self, state, now):
+        if state == self.state:
+            return False
+        hold = self.min_on if self.state else self.min_off
+        if now - self.changed < hold:
+            return False
+        self.state = state
+        self.changed = now
+        return True
+
+
+class Controller:
+    def __init__(self, write, hysteresis, min_on, min_off, keepalive):
+        self.write = write
+        self.hysteresis = hysteresis
+        self.keepalive = keepalive
+        self.actuators = {name: Actuator(min_on, min_off) for name in ACTUATORS}
+        self.thresholds = {}
+        self.values = {}
+        self.comfort = {}
+        self.last_write = float('-inf')
+        self.writes = 0
+        self.latency = {'count': 0, 'last': None, 'max': 0.0, 'total': 0.0}
+        self.lock = threading.Lock()
+
+    def configure(self, temp_low, temp_high, hum_low, hum_high, light_threshold):
+        with self.lock:
+            self.thresholds = {'T': (temp_low, temp_high), 'H': (hum_low, hum_high), 'L': light_threshold}
+
+    def statuses(self):
+        return [self.actuators[name].state for name in ACTUATORS]
+
+    def switch(self, name, on, off):
+        # keep the current state inside the hysteresis band
+        state = self.actuators[name].state
+        if on:
+            state = 1
+        elif off:
+            state = 0
+        return self.actuators[name].set(state, time.time())
+
+    def apply(self, unit, value):
+        if unit == 'T':
+            low, high = self.thresholds['T']
+            band = self.hysteresis['T']
+            self.comfort[unit] = 'ok' if high > value > low else 'high' if value >= high else 'low'
+            heating = self.switch('heating', value <= low, value >= low + band)
+            cooling = self.switch('cooling', value >= high, value <= high - band)
+            return heating or cooling
+        if unit == 'H':
+            low, high = self.thresholds['H']
+            self.comfort[unit] = 'ok' if high > value > low else 'high' if value >= high else 'low'
+            return self.switch('humidifier', value <= low, value >= low + self.hysteresis['H'])
+        if unit == 'L':
+            threshold = self.thresholds['L']
+            self.comfort[unit] = 'dark' if value <= threshold else 'ok'
+            return self.switch('light', value <= threshold, value > threshold + self.hysteresis['L'])
+        return False
+
+    def send(self):
+        light, heating, cooling, humidifier = self.statuses()
+        self.write(f"{light}{heating}{cooling}{humidifier}|")
+        self.last_write = time.time()
+        self.writes += 1
+
+    def observe(self, unit, value):
+        with self.lock:
+            self.values[unit] = value
+
+    def evaluate(self, unit, value, sample_time):
+        with self.lock:
+            self.values[unit] = value
+            if self.apply(unit, value):
+                self.send()
+                latency = self.last_write - sample_time
+                self.latency['count'] += 1
+                self.latency['last'] = latency
+                self.latency['total'] += latency
+                self.latency['max'] = max(self.latency['max'], latency)
+
+    def tick(self):
+        with self.lock:
+            # retry changes held back by the minimum on/off times
+            changed = False
+            for unit, value in self.values.items():
+                changed = self.apply(unit, value) or changed
+            if changed or time.time() - self.last_write >= self.keepalive:
+                self.send()
+
+    def stats(self):
+        with self.lock:
+            count = self.latency['count']
+            return {
+                'statuses': self.statuses(),
+                'writes': self.writes,
+                'actuations': count,
+                'latency_last': self.latency['last'],
+                'latency_mean': self.latency['total'] / count if count else None,
+                'latency_max': self.latency['max'],
+            }
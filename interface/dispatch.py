@@ -0,0 +1,101 @@
+import queue
+import time
+import traceback
+
+import metrics
+
+FRAME_BUDGET = 1 / 25
+
+
+def record(stat, value):
+    stat['count'] += 1
+    stat['last'] = value
+    stat['total'] += value
+    stat['max'] = max(stat['max'], value)
+
+
+def summary(stat):
+    return {
+        'last': stat['last'],
+        'mean': stat['total'] / stat['count'] if stat['count'] else None,
+        'max': stat['max'],
+    }
+
+
+class Dispatcher:
+    def __init__(self, widget, budget=FRAME_BUDGET):
+        self.widget = widget
+        self.budget = budget
+        self.pending = queue.SimpleQueue()
+        self.posted = 0
+        self.coalesced = 0
+        self.overruns = 0
+        self.errors = 0
+        self.frame_time = {'count': 0, 'last': None, 'max': 0.0, 'total': 0.0}
+        self.lag = {'count': 0, 'last': None, 'max': 0.0, 'total': 0.0}
+        self.schedule(budget)
+
+    def post(self, key, func, *args):
+        # safe from any thread, only the Tk thread ever touches widgets
+        self.pending.put((key, time.perf_counter(), func, args))
+
+    def schedule(self, delay):
+        self.widget.after(max(1, int(delay * 1000)), self.drain)
+
+    def drain(self):
+        started = time.perf_counter()
+        try:
+            self.flush(started)
+        finally:
+            # the next frame is scheduled whatever happened in this one
+            self.schedule(self.budget - (time.perf_counter() - started))
+
+    def flush(self, started):
+        updates = {}
+        oldest = None
+        while True:
+            try:
+                key, posted, func, args = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if oldest is None:
+                oldest = posted
+            if key in updates:
+                self.coalesced += 1
+            # a burst of updates for the same key collapses into the newest one
+            updates[key] = (func, args)
+            self.posted += 1
+
+        if not updates:
+            return
+        for func, args in updates.values():
+            self.run(func, args)
+        self.widget.update_idletasks()
+        elapsed = time.perf_counter() - started
+        record(self.lag, started - oldest)
+        record(self.frame_time, elapsed)
+        metrics.observe('ui_queue_lag', started - oldest)
+        metrics.observe('ui_frame', elapsed)
+        if elapsed > self.budget:
+            self.overruns += 1
+            metrics.count('ui_overruns')
+
+    def run(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            # one failing update must not keep the others from the screen
+            self.errors += 1
+            metrics.count('ui_errors')
+            traceback.print_exc()
+
+    def stats(self):
+        return {
+            'frames': self.frame_time['count'],
+            'posted': self.posted,
+            'coalesced': self.coalesced,
+            'overruns': self.overruns,
+            'errors': self.errors,
+            'frame_time': summary(self.frame_time),
+            'queue_lag': summary(self.lag),
+        }
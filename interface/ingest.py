@@ -0,0 +1,162 @@
+import queue
+import selectors
+import threading
+import time
+
+import metrics
+from clock import DeviceClock
+from protocol import StreamDecoder
+
+
+def drain(records, timeout):
+    try:
+        batch = [records.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+
+    while True:
+        try:
+            batch.append(records.get_nowait())
+        except queue.Empty:
+            return batch
+
+
+class IngestStats:
+    def __init__(self, records, decoder, clock):
+        self.records = records
+        self.decoder = decoder
+        self.clock = clock
+        self.lines = 0
+        self.dropped = 0
+        self.mark = (time.monotonic(), 0)
+        self.rate = 0.0
+
+    def lines_per_second(self):
+        now = time.monotonic()
+        mark_time, mark_lines = self.mark
+        if now - mark_time >= 1:
+            self.rate = (self.lines - mark_lines) / (now - mark_time)
+            self.mark = (now, self.lines)
+        return self.rate
+
+    def snapshot(self):
+        return {
+            'lines': self.lines,
+            'frames': self.decoder.frames,
+            'protocol': self.decoder.mode,
+            'lines_per_second': round(self.lines_per_second(), 2),
+            'queue_depth': self.records.qsize(),
+            'dropped': self.dropped,
+            'malformed': self.decoder.malformed,
+            'clock': self.clock.snapshot(),
+        }
+
+
+class PortReader:
+    def __init__(self, name, connection, records, resync=False):
+        self.name = name
+        self.connection = connection
+        self.decoder = StreamDecoder(resync)
+        self.clock = DeviceClock()
+        self.stats = IngestStats(records, self.decoder, self.clock)
+        self.error = None
+
+
+class SerialMultiplexer(threading.Thread):
+    def __init__(self, records, put_timeout=1.0, poll_interval=0.05):
+        threading.Thread.__init__(self, name="serial-reader", daemon=True)
+        self.records = records
+        self.put_timeout = put_timeout
+        self.poll_interval = poll_interval
+        self.selector = selectors.DefaultSelector()
+        self.ports = {}
+        self.polled = set()
+        self.changes = queue.SimpleQueue()
+        self.stopped = threading.Event()
+
+    def add(self, name, connection, resync=False):
+        port = PortReader(name, connection, self.records, resync)
+        self.changes.put((name, port))
+        return port
+
+    def remove(self, name):
+        self.changes.put((name, None))
+
+    def stop(self):
+        self.stopped.set()
+
+    def apply_changes(self):
+        # ports are only (un)registered on the reader thread, between two selects
+        while True:
+            try:
+                name, port = self.changes.get_nowait()
+            except queue.Empty:
+                return
+            previous = self.ports.pop(name, None)
+            if previous is not None:
+                self.detach(previous)
+            if port is not None:
+                self.ports[name] = port
+                self.attach(port)
+
+    def attach(self, port):
+        try:
+            self.selector.register(port.connection.fileno(), selectors.EVENT_READ, port)
+        except (AttributeError, OSError, ValueError):
+            # Windows COM ports and loop:// have no descriptor to wait on
+            self.polled.add(port)
+
+    def detach(self, port):
+        self.polled.discard(port)
+        for key in list(self.selector.get_map().values()):
+            if key.data is port:
+                self.selector.unregister(key.fileobj)
+
+    def waiting(self, port):
+        try:
+            return port.connection.in_waiting > 0
+        except OSError as error:
+            self.fail(port, error)
+            return False
+
+    def fail(self, port, error):
+        port.error = error
+        self.detach(port)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.apply_changes()
+            if self.records.full():
+                # unread bytes wait in the driver buffer until the consumer catches up
+                self.stopped.wait(self.poll_interval)
+                continue
+            timeout = self.poll_interval if self.polled else 0.5
+            if self.selector.get_map():
+                ready = [key.data for key, events in self.selector.select(timeout)]
+            else:
+                self.stopped.wait(timeout)
+                ready = []
+            ready.extend(port for port in list(self.polled) if self.waiting(port))
+            for port in ready:
+                self.read(port)
+
+    def read(self, port):
+        try:
+            chunk = port.connection.read(port.connection.in_waiting or 1)
+        except OSError as error:
+            self.fail(port, error)
+            return
+        if not chunk:
+            return
+
+        now = time.time()
+        for sensor, quantity, value, millis, line in port.decoder.feed(chunk):
+            port.stats.lines += 1
+            # stations without device time fall back to the arrival time
+            timestamp = now if millis is None else port.clock.to_wall(millis, now)
+            try:
+                # blocks while the consumer catches up, drops only if it stalls
+                self.records.put((port.name, timestamp, sensor, quantity, value, line), timeout=self.put_timeout)
+            except queue.Full:
+                port.stats.dropped += 1
+                metrics.count('ingest_dropped', station=port.name)
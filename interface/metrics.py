@@ -0,0 +1,228 @@
+import bisect
+import contextlib
+import functools
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# upper bounds in seconds, the last bucket takes everything slower
+BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+RATE_SPAN = 10
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the quantile, good enough to spot a slow path
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class RateMeter:
+    def __init__(self, span=RATE_SPAN):
+        self.span = span
+        self.buckets = [0] * span
+        self.second = int(time.monotonic())
+
+    def roll(self):
+        now = int(time.monotonic())
+        for second in range(max(self.second, now - self.span) + 1, now + 1):
+            self.buckets[second % self.span] = 0
+        self.second = max(self.second, now)
+
+    def add(self, n):
+        self.roll()
+        self.buckets[self.second % self.span] += n
+
+    def rate(self):
+        # the current second is still filling up, so it is left out
+        self.roll()
+        return (sum(self.buckets) - self.buckets[self.second % self.span]) / (self.span - 1)
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def sample_name(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{label}="{value}"' for label, value in labels) + '}'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.rates = {}
+        self.gauges = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def count(self, name, n=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+            if key not in self.rates:
+                self.rates[key] = RateMeter()
+            self.rates[key].add(n)
+
+    def total(self, name):
+        with self.lock:
+            return sum(value for (counter, labels), value in self.counters.items() if counter == name)
+
+    def gauge(self, name, read):
+        # read returns {labels: value}, labels as a tuple of (name, value) pairs
+        self.gauges[name] = read
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def read_gauges(self):
+        values = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                values[name] = read()
+            except (OSError, ValueError):
+                values[name] = {}
+        return values
+
+    def snapshot(self):
+        with self.lock:
+            timings = [{'name': name, 'labels': dict(labels), 'count': histogram.count,
+                        'mean': histogram.sum / histogram.count if histogram.count else None,
+                        'p50': histogram.quantile(0.5), 'p95': histogram.quantile(0.95),
+                        'p99': histogram.quantile(0.99)}
+                       for (name, labels), histogram in self.histograms.items()]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value,
+                         'rate': self.rates[name, labels].rate()}
+                        for (name, labels), value in self.counters.items()]
+        gauges = [{'name': name, 'labels': dict(labels), 'value': value}
+                  for name, values in self.read_gauges().items() for labels, value in values.items()]
+        return {'timings': timings, 'counters': counters, 'gauges': gauges}
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{sample_name(f'rpm_{name}_seconds_bucket', labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{sample_name(f'rpm_{name}_seconds_sum', labels)} {histogram.sum}")
+                lines.append(f"{sample_name(f'rpm_{name}_seconds_count', labels)} {histogram.count}")
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{sample_name(f'rpm_{name}_total', labels)} {value}")
+        for name, values in sorted(self.read_gauges().items()):
+            for labels, value in values.items():
+                lines.append(f"{sample_name(f'rpm_{name}', labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+observe = registry.observe
+count = registry.count
+gauge = registry.gauge
+total = registry.total
+timer = registry.timer
+timed = registry.timed
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = registry.prometheus().encode(), 'text/plain; version=0.0.4'
+        elif self.path in ('/', '/metrics.json'):
+            body, content_type = json.dumps(registry.snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+class SamplingProfiler(threading.Thread):
+    def __init__(self, duration, path, interval=0.005):
+        threading.Thread.__init__(self, name="profiler", daemon=True)
+        self.duration = duration
+        self.path = path
+        self.interval = interval
+
+    def run(self):
+        stacks = Counter()
+        end = time.monotonic() + self.duration
+        while time.monotonic() < end:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[';'.join([names.get(ident, str(ident))] + stack[::-1])] += 1
+            time.sleep(self.interval)
+
+        # folded stacks, one "frame;frame;frame count" line each, as flamegraph.pl and speedscope read them
+        with open(self.path, 'w') as file:
+            for stack, samples in stacks.most_common():
+                file.write(f"{stack} {samples}\n")
+        print(f"Profil spremljen u {self.path}")
+
+
+def profile(duration):
+    path = f"profile_{time.strftime('%Y%m%d_%H%M%S')}.folded"
+    SamplingProfiler(duration, path).start()
+    return path
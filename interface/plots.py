@@ -0,0 +1,67 @@
+import numpy as np
+import matplotlib.dates as mdates
+
+from readings import to_datetime64
+
+X_HEADROOM = 0.1
+Y_MARGIN = 0.05
+
+
+class LivePlot:
+    def __init__(self, figure, title, unit, window, scale=1):
+        self.figure = figure
+        self.window = window
+        self.scale = scale
+        self.limits = None
+        self.background = None
+
+        self.axes = figure.add_subplot(111)
+        self.axes.set_title(title)
+        self.axes.set_ylabel(unit)
+        self.axes.set_xlabel("Vrijeme")
+        self.set_window(window)
+        self.axes.get_yaxis().get_major_formatter().set_useOffset(False)
+        self.line, = self.axes.plot([], [], color='red', animated=True)
+
+        figure.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def set_window(self, window):
+        self.window = window
+        self.limits = None
+        time_format = '%H:%M' if window <= 86400 else '%d/%m'
+        self.axes.xaxis.set_major_formatter(mdates.DateFormatter(time_format))
+
+    def on_draw(self, event):
+        self.background = self.figure.canvas.copy_from_bbox(self.figure.bbox)
+        self.axes.draw_artist(self.line)
+
+    def in_limits(self, timestamps, values):
+        if self.limits is None:
+            return False
+        x_min, x_max, y_min, y_max = self.limits
+        return timestamps[-1] <= x_max and y_min <= values.min() and values.max() <= y_max
+
+    def rescale(self, timestamps, values):
+        x_max = timestamps[-1] + self.window * X_HEADROOM
+        x_min = x_max - self.window * (1 + X_HEADROOM)
+        y_min, y_max = values.min(), values.max()
+        margin = (y_max - y_min) * Y_MARGIN or abs(y_max) * Y_MARGIN or 1
+        self.limits = (x_min, x_max, y_min - margin, y_max + margin)
+
+        self.axes.set_xlim(to_datetime64(np.array([x_min, x_max])))
+        self.axes.set_ylim(self.limits[2], self.limits[3])
+
+    def update(self, timestamps, values):
+        values = values * self.scale
+        self.line.set_data(to_datetime64(timestamps), values)
+        canvas = self.figure.canvas
+
+        if len(values) > 0 and not self.in_limits(timestamps, values):
+            self.rescale(timestamps, values)
+            canvas.draw()
+        elif self.background is None:
+            canvas.draw()
+        else:
+            canvas.restore_region(self.background)
+            self.axes.draw_artist(self.line)
+            canvas.blit(self.figure.bbox)
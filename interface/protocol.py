@@ -0,0 +1,137 @@
+import binascii
+import math
+import struct
+
+# binary frame: sync, sample count, count * SAMPLE, CRC-16/CCITT over count and samples
+SYNC = b'\xa5\x5a'
+SAMPLE = struct.Struct('<BcfI')
+CRC = struct.Struct('<H')
+HEADER_SIZE = len(SYNC) + 1
+MAX_PENDING = 4096
+
+SENSORS = {1: 'TMP116', 2: 'HDC2010', 3: 'OPT3001', 4: 'DPS310'}
+
+# appended to actuator commands to ask the station for binary frames, older
+# sketches only read the first four characters and keep sending text
+BINARY_REQUEST = 'B'
+
+
+def finite(text):
+    # a single nan or inf would poison every running sum it enters
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"neispravna vrijednost {text}")
+    return value
+
+
+def parse_line(raw):
+    try:
+        line = raw.decode()
+        fields = line.split(', ')
+        if len(fields) == 3:
+            sensor, quantity, value = fields
+            return sensor, quantity, finite(value), None, line
+        sensor, quantity, value, millis = fields
+        # the device time is kept apart, readings files hold only the first three fields
+        return sensor, quantity, finite(value), int(millis), f"{sensor}, {quantity}, {value}\r\n"
+    except ValueError:
+        return None
+
+
+def decode_samples(body):
+    samples = []
+    for sensor_id, quantity, value, millis in SAMPLE.iter_unpack(body):
+        if not math.isfinite(value):
+            continue
+        sensor = SENSORS.get(sensor_id, str(sensor_id))
+        quantity = quantity.decode('ascii', 'replace')
+        # same text the station prints in text mode, so CSV readings look alike
+        samples.append((sensor, quantity, value, millis, f"{sensor}, {quantity}, {value:.2f}\r\n"))
+    return samples
+
+
+class StreamDecoder:
+    def __init__(self, resync=False):
+        self.pending = bytearray()
+        # a stream joined mid-way is only decoded from the first line or frame boundary on
+        self.resync = resync
+        self.mode = None
+        self.frames = 0
+        self.lines = 0
+        self.malformed = 0
+
+    def skip_partial(self):
+        newline = self.pending.find(b'\n')
+        sync = self.pending.find(SYNC, 0, len(self.pending) if newline == -1 else newline)
+        if sync != -1:
+            start = sync
+        elif newline != -1:
+            start = newline + 1
+        else:
+            # a sync marker may still be split across chunks
+            del self.pending[:max(0, len(self.pending) - len(SYNC) + 1)]
+            return False
+        del self.pending[:start]
+        self.resync = False
+        return True
+
+    def feed(self, chunk):
+        self.pending += chunk
+        if self.resync and not self.skip_partial():
+            return []
+        records, position = self.decode()
+        if position == 0 and len(self.pending) > MAX_PENDING:
+            self.malformed += 1
+            position = len(self.pending)
+        # the memoryviews are gone once decode returns, so resizing is allowed
+        del self.pending[:position]
+        return records
+
+    def decode(self):
+        records = []
+        view = memoryview(self.pending)
+        size = len(view)
+        position = 0
+
+        while position < size:
+            if self.pending.startswith(SYNC, position):
+                if size - position < HEADER_SIZE:
+                    break
+                count = view[position + len(SYNC)]
+                end = position + HEADER_SIZE + count * SAMPLE.size + CRC.size
+                if end > size:
+                    break
+                body = view[position + len(SYNC):end - CRC.size]
+                if count == 0 or binascii.crc_hqx(body, 0xFFFF) != CRC.unpack_from(view, end - CRC.size)[0]:
+                    # not a frame after all, resync on the next sync or newline
+                    self.malformed += 1
+                    position += 1
+                    continue
+                samples = decode_samples(body[1:])
+                # non-finite samples are left out, the rest of the frame is still good
+                self.malformed += count - len(samples)
+                records.extend(samples)
+                self.frames += 1
+                self.mode = 'binary'
+                position = end
+                continue
+
+            newline = self.pending.find(b'\n', position)
+            sync = self.pending.find(SYNC, position, size if newline == -1 else newline)
+            if sync != -1:
+                self.malformed += 1
+                position = sync
+                continue
+            if newline == -1:
+                break
+
+            record = parse_line(bytes(view[position:newline + 1]))
+            position = newline + 1
+            self.lines += 1
+            if record is None:
+                self.malformed += 1
+            else:
+                records.append(record)
+                self.mode = 'text'
+
+        return records, position
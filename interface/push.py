@@ -0,0 +1,173 @@
+import http.server
+import json
+import math
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+
+# a silent stream still sends a comment this often, so dead connections are noticed
+KEEPALIVE = 15
+# samples one subscriber may fall behind by before the oldest are dropped
+MAX_PENDING = 10000
+
+
+def stream_name(sensor, quantity):
+    return f"{sensor}:{quantity}"
+
+
+def series(pairs):
+    return {'timestamps': [timestamp for timestamp, value in pairs], 'values': [value for timestamp, value in pairs]}
+
+
+class Subscription:
+    def __init__(self, keys, max_pending=MAX_PENDING):
+        # keys are (station, sensor, quantity)
+        self.keys = set(keys)
+        self.pending = deque(maxlen=max_pending)
+        self.ready = threading.Condition()
+        self.since = {}
+        self.dropped = 0
+
+    def offer(self, station, batch):
+        with self.ready:
+            for timestamp, sensor, quantity, value, line in batch:
+                if (station, sensor, quantity) not in self.keys:
+                    continue
+                if len(self.pending) == self.pending.maxlen:
+                    self.dropped += 1
+                    metrics.count('push_dropped')
+                self.pending.append(((station, sensor, quantity), timestamp, value))
+            if self.pending:
+                self.ready.notify()
+
+    def take(self, timeout):
+        with self.ready:
+            if not self.pending:
+                self.ready.wait(timeout)
+            taken = list(self.pending)
+            self.pending.clear()
+        # whatever the snapshot already covered is not sent twice
+        delta = {}
+        for key, timestamp, value in taken:
+            if timestamp > self.since.get(key, -math.inf):
+                delta.setdefault(key, []).append((timestamp, value))
+        return delta
+
+
+class Broker:
+    def __init__(self, history, max_pending=MAX_PENDING):
+        # history(station, sensor, quantity, start, end, max_points) -> (timestamps, values)
+        self.history = history
+        self.max_pending = max_pending
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self, keys, history, max_points=None):
+        # registered before the snapshot is taken, so no sample falls between the two
+        subscription = Subscription(keys, self.max_pending)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        end = time.time()
+        snapshot = {}
+        for key in sorted(subscription.keys):
+            timestamps, values = self.history(*key, end - history, end, max_points)
+            if len(timestamps) > 0:
+                subscription.since[key] = float(timestamps[-1])
+            snapshot.setdefault(key[0], {})[stream_name(*key[1:])] = {'timestamps': timestamps.tolist(),
+                                                                      'values': values.tolist()}
+        return subscription, snapshot
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, station, batch):
+        if not self.subscriptions:
+            return
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(station, batch)
+
+
+class PushHandler(http.server.BaseHTTPRequestHandler):
+    broker = None
+    streams = {}
+    defaults = {}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/stream':
+            self.send_error(404)
+            return
+        try:
+            keys, interval, history, max_points = self.parse(parse_qs(url.query))
+        except ValueError as error:
+            # the reason phrase is latin-1 only, station names may not be
+            self.send_error(400, None, str(error))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        subscription, snapshot = self.broker.subscribe(keys, history, max_points)
+        try:
+            self.send_event('snapshot', 0, snapshot)
+            sequence = 0
+            while True:
+                delta = subscription.take(KEEPALIVE)
+                if not delta:
+                    self.wfile.write(b': \n\n')
+                    self.wfile.flush()
+                    continue
+                sequence += 1
+                batch = {}
+                for (station, sensor, quantity), pairs in delta.items():
+                    batch.setdefault(station, {})[stream_name(sensor, quantity)] = series(pairs)
+                self.send_event('delta', sequence, batch)
+                # whatever arrives in the meantime goes out together in the next event
+                time.sleep(interval)
+        except OSError:
+            pass
+        finally:
+            self.broker.unsubscribe(subscription)
+
+    def parse(self, query):
+        stations = query['station'][0].split(',') if 'station' in query else list(self.streams)
+        keys = []
+        for station in stations:
+            if station not in self.streams:
+                raise ValueError(f"nepoznata stanica {station}")
+            names = query['streams'][0].split(',') if 'streams' in query else self.streams[station]
+            for name in names:
+                if name not in self.streams[station]:
+                    raise ValueError(f"nepoznat tok {name} na stanici {station}")
+                keys.append((station, *name.split(':')))
+        interval = float(query.get('interval', [self.defaults['interval']])[0])
+        history = float(query.get('history', [self.defaults['history']])[0])
+        max_points = int(query['max_points'][0]) if 'max_points' in query else None
+        return keys, interval, history, max_points
+
+    def send_event(self, event, sequence, data):
+        self.wfile.write(f"event: {event}\nid: {sequence}\ndata: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+        metrics.count('push_events', event=event)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, broker, streams, interval, history):
+    # streams maps every station to the names of the streams it sends
+    handler = type('Handler', (PushHandler,), {'broker': broker, 'streams': streams,
+                                               'defaults': {'interval': interval, 'history': history}})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="push", daemon=True).start()
+    return server
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import numpy as np
+
+# stamps carry milliseconds, files written before that hold whole seconds and still load
+TIME_FORMAT = "%d/%m/%Y %H:%M:%S.%f"
+SECONDS_FORMAT = "%d/%m/%Y %H:%M:%S"
+SECONDS_LENGTH = 19
+TIME_LENGTH = SECONDS_LENGTH + 4
+STAMP_DIGITS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18]
+STAMP_SEPARATORS = {2: '/', 5: '/', 10: ' ', 13: ':', 16: ':'}
+
+column_names = ['Vrijeme', 'Senzor', 'Velicina', 'Iznos']
+
+
+def format_time(timestamp):
+    # %f gives microseconds, the last three digits are dropped
+    return datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT)[:-3]
+
+
+# Readings are stamped with naive local time; the current UTC offset is used
+# for the whole window, so samples across a DST change shift by an hour.
+def local_offset():
+    return datetime.now().astimezone().utcoffset().total_seconds()
+
+
+def to_epoch(times):
+    return times.astype('datetime64[ms]').astype(np.int64) / 1000 - local_offset()
+
+
+def to_datetime64(timestamps):
+    return ((timestamps + local_offset()) * 1000).astype(np.int64).astype('datetime64[ms]')
+
+
+def parse_codes(codes):
+    # character codes of the first TIME_LENGTH characters of every stamp, one row each
+    digits = codes.astype(np.int64) - ord('0')
+    fractional = codes[:, SECONDS_LENGTH] == ord('.')
+    valid = np.all((digits[:, STAMP_DIGITS] >= 0) & (digits[:, STAMP_DIGITS] <= 9), axis=1)
+    valid &= ~fractional | np.all((digits[:, SECONDS_LENGTH + 1:] >= 0) & (digits[:, SECONDS_LENGTH + 1:] <= 9), axis=1)
+    for position, separator in STAMP_SEPARATORS.items():
+        valid &= codes[:, position] == ord(separator)
+
+    def number(first, last):
+        return digits[:, first:last] @ 10 ** np.arange(last - first - 1, -1, -1)
+
+    day, month, year = number(0, 2), number(3, 5), number(6, 10)
+    hour, minute, second = number(11, 13), number(14, 16), number(17, 19)
+    valid &= (1 <= month) & (month <= 12) & (1 <= day) & (day <= 31) & (hour < 24) & (minute < 60) & (second < 60)
+    millis = np.where(fractional, number(SECONDS_LENGTH + 1, TIME_LENGTH), 0)
+
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0)
+    days = months.astype('datetime64[M]').astype('datetime64[D]') + np.where(valid, day - 1, 0)
+    times = days.astype('datetime64[ms]') + (((hour * 60 + minute) * 60 + second) * 1000 + millis)
+    times[~valid] = np.datetime64('NaT')
+    return times
+
+
+def parse_times(strings):
+    # old files hold whole seconds, the columns after them are then simply not a fraction
+    codes = np.asarray(strings, dtype=f'U{TIME_LENGTH}')
+    return parse_codes(codes.view(np.uint32).reshape(len(codes), TIME_LENGTH))
+
+
+def load_readings(path):
+    # pandas is only needed once the history is loaded, importing it up front delays the first sample
+    import pandas as pd
+    data = pd.read_csv(path, names=column_names, usecols=['Vrijeme', 'Iznos'])
+    times = parse_times(data['Vrijeme'])
+    values = pd.to_numeric(data['Iznos'], errors='coerce').to_numpy(dtype=np.float64)
+    valid = ~(np.isnat(times) | np.isnan(values))
+    return times[valid], values[valid]
+
+
+def line_index(data):
+    # end offset and timestamp of every line in a raw readings file
+    buffer = np.frombuffer(data + b'\0' * TIME_LENGTH, dtype=np.uint8)
+    ends = np.flatnonzero(buffer[:len(data)] == ord('\n')) + 1
+    if len(data) > 0 and data[-1:] != b'\n':
+        ends = np.append(ends, len(data))
+    starts = np.concatenate(([0], ends))[:-1]
+
+    times = parse_codes(buffer[starts[:, None] + np.arange(TIME_LENGTH)])
+    timestamps = np.where(np.isnat(times), 0, to_epoch(times))
+    return timestamps, ends
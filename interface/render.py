@@ -0,0 +1,192 @@
+import atexit
+import json
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import tkinter as tk
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import metrics
+
+
+def attach(name):
+    block = shared_memory.SharedMemory(name)
+    # the block belongs to the parent, the worker must not unlink it when it exits
+    resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+
+class RenderWorker:
+    def __init__(self, slots, size, dpi, points):
+        self.slots = slots
+        self.points = points
+        self.width, self.height = int(size[0] * dpi), int(size[1] * dpi)
+        self.data = shared_memory.SharedMemory(create=True, size=slots * 2 * points * 8)
+        self.image = shared_memory.SharedMemory(create=True, size=slots * self.height * self.width * 4)
+        self.series = np.ndarray((slots, 2, points), dtype=np.float64, buffer=self.data.buf)
+        self.bitmaps = np.ndarray((slots, self.height, self.width, 4), dtype=np.uint8, buffer=self.image.buf)
+        self.handlers = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.failed = False
+        # a process of its own, so the worker never imports the Tk application again
+        self.process = subprocess.Popen([sys.executable, __file__, self.data.name, self.image.name,
+                                         json.dumps([slots, list(size), dpi, points])],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        threading.Thread(target=self.receive, name="render", daemon=True).start()
+        atexit.register(self.close)
+
+    def send(self, message):
+        with self.lock:
+            pickle.dump(message, self.process.stdin)
+            self.process.stdin.flush()
+
+    def add(self, title, unit, window, scale, rendered, failed=None):
+        index = len(self.handlers)
+        if index == self.slots:
+            raise ValueError("nema slobodnog mjesta za graf")
+        self.handlers.append((rendered, failed))
+        self.send(('plot', index, title, unit, window, scale))
+        return index
+
+    def submit(self, index, timestamps, values, window):
+        # the slot is free, its previous frame was already handed back
+        count = min(len(timestamps), self.points)
+        self.series[index, 0, :count] = timestamps[len(timestamps) - count:]
+        self.series[index, 1, :count] = values[len(values) - count:]
+        self.send(('render', index, count, window))
+
+    def bitmap(self, index):
+        return self.bitmaps[index]
+
+    def receive(self):
+        while True:
+            try:
+                index = pickle.load(self.process.stdout)
+            except (EOFError, OSError, pickle.UnpicklingError):
+                break
+            self.handlers[index][0](index)
+        if self.closed:
+            return
+        # a worker that died takes every frame still being drawn with it
+        self.failed = True
+        metrics.count('render_failed')
+        print(f"iscrtavanje grafova prekinuto, izlazni kod {self.process.wait()}", file=sys.stderr)
+        for index, (rendered, failed) in enumerate(self.handlers):
+            if failed is not None:
+                failed(index)
+
+    def close(self):
+        self.closed = True
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.process.wait(2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.data is not None:
+            # the views have to go before the blocks can be closed
+            self.series = self.bitmaps = None
+            for block in (self.data, self.image):
+                block.close()
+                block.unlink()
+            self.data = self.image = None
+
+
+class BitmapPlot:
+    def __init__(self, parent, worker, dispatcher, title, unit, window, scale=1):
+        self.worker = worker
+        self.dispatcher = dispatcher
+        self.window = window
+        self.submitted = None
+        self.photo = tk.PhotoImage(master=parent, width=worker.width, height=worker.height)
+        self.widget = tk.Label(parent, image=self.photo, borderwidth=0)
+        # the bitmap goes to Tk as a binary PPM, so the window never loads matplotlib for it
+        self.header = f"P6 {worker.width} {worker.height} 255\n".encode()
+        self.index = worker.add(title, unit, window, scale, self.rendered, self.failed)
+        self.name = title
+
+    def set_window(self, window):
+        self.window = window
+
+    def update(self, timestamps, values):
+        # a plot still being drawn skips this frame instead of queueing behind itself
+        if self.submitted is not None:
+            metrics.count('render_skipped', plot=self.name)
+            return
+        if self.worker.failed:
+            return
+        self.submitted = time.perf_counter()
+        self.worker.submit(self.index, timestamps, values, self.window)
+
+    def rendered(self, index):
+        # called on the render thread, only the Tk thread touches the photo
+        self.dispatcher.post(('render', index), self.blit)
+
+    def failed(self, index):
+        self.dispatcher.post(('render', index), self.show_failure)
+
+    def blit(self):
+        rgb = self.worker.bitmap(self.index)[:, :, :3]
+        self.photo.configure(data=self.header + rgb.tobytes(), format='PPM')
+        metrics.observe('render_worker', time.perf_counter() - self.submitted, plot=self.name)
+        self.submitted = None
+
+    def show_failure(self):
+        self.submitted = None
+        self.widget.configure(image='', text="Iscrtavanje grafa nije uspjelo")
+
+
+def render_loop(data_name, image_name, slots, size, dpi, points):
+    import matplotlib
+
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from plots import LivePlot
+
+    data = attach(data_name)
+    image = attach(image_name)
+    series = np.ndarray((slots, 2, points), dtype=np.float64, buffer=data.buf)
+    bitmaps = np.ndarray((slots, int(size[1] * dpi), int(size[0] * dpi), 4), dtype=np.uint8, buffer=image.buf)
+    plots = {}
+    requests, responses = sys.stdin.buffer, sys.stdout.buffer
+    try:
+        while True:
+            try:
+                message = pickle.load(requests)
+            except EOFError:
+                return
+            if message[0] == 'plot':
+                index, title, unit, window, scale = message[1:]
+                figure = Figure(figsize=size, dpi=dpi)
+                FigureCanvasAgg(figure)
+                plots[index] = LivePlot(figure, title, unit, window, scale)
+                figure.canvas.draw()
+                continue
+
+            index, count, window = message[1:]
+            plot = plots[index]
+            if window != plot.window:
+                plot.set_window(window)
+            plot.update(series[index, 0, :count], series[index, 1, :count])
+            bitmaps[index] = plot.figure.canvas.buffer_rgba()
+            pickle.dump(index, responses)
+            responses.flush()
+    finally:
+        series = bitmaps = None
+        data.close()
+        image.close()
+
+
+if __name__ == '__main__':
+    slots, size, dpi, points = json.loads(sys.argv[3])
+    render_loop(sys.argv[1], sys.argv[2], slots, tuple(size), dpi, points)
@@ -0,0 +1,81 @@
+import os
+from collections import deque
+
+from binlog import HEADER_SIZE, record_index
+from readings import line_index
+from writer import replace_tail
+
+
+class RetentionLog:
+    def __init__(self, path, window, binary=False, compact_ratio=0.5, compact_min=16384, writer=None):
+        self.path = path
+        self.writer = writer
+        self.window = window
+        self.binary = binary
+        self.header = HEADER_SIZE if binary else 0
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        # (timestamp, end offset) for every record still in the file; offsets are
+        # counted from self.base, the number of bytes already compacted away
+        self.index = deque()
+        self.base = 0
+        self.head = self.header
+        self.end = self.header
+        self.compacted_bytes = 0
+
+    def load(self):
+        self.index.clear()
+        self.base = 0
+        self.head = self.end = self.header
+        if not os.path.exists(self.path):
+            return
+
+        if self.binary:
+            timestamps, ends = record_index(self.path)
+        else:
+            with open(self.path, 'rb') as file:
+                timestamps, ends = line_index(file.read())
+        self.index.extend(zip(timestamps.tolist(), ends.tolist()))
+        if len(ends) > 0:
+            self.end = int(ends[-1])
+
+    def appended(self, timestamp, size):
+        self.end += size
+        self.index.append((timestamp, self.end))
+
+    def expire(self, now):
+        cutoff = now - self.window
+        while self.index and self.index[0][0] < cutoff:
+            self.head = self.index.popleft()[1]
+
+        dead = self.head - self.base - self.header
+        if dead > 0 and (not self.index or dead >= self.compact_min and
+                         dead >= (self.end - self.base) * self.compact_ratio):
+            self.compact()
+
+    def compact(self):
+        # the writer commits what it still holds for the file before the swap
+        if self.writer is not None:
+            self.compacted_bytes += self.writer.rotate(self.path, self.head - self.base, self.header)
+        else:
+            self.compacted_bytes += replace_tail(self.path, self.head - self.base, self.header)
+        self.base = self.head - self.header
+
+
+class Retention:
+    def __init__(self, windows, **kwargs):
+        self.logs = {file: RetentionLog(file, window, **kwargs) for file, window in windows.items()}
+
+    def __getitem__(self, file):
+        return self.logs[file]
+
+    def load(self):
+        for log in self.logs.values():
+            log.load()
+
+    def appended(self, file, timestamp, size):
+        self.logs[file].appended(timestamp, size)
+
+    def expire(self, now):
+        for log in self.logs.values():
+            log.expire(now)
@@ -0,0 +1,407 @@
+import argparse
+import atexit
+import os
+
+import serial.tools.list_ports
+import json
+import queue
+import socketserver
+import threading
+import time
+import traceback
+from datetime import datetime
+import configparser
+from collections import Counter
+
+import metrics
+import push
+from archive import ArchiveCompactor
+from ingest import SerialMultiplexer, drain
+from station import Station
+from streams import load_streams
+from supervisor import SerialSupervisor
+
+config = configparser.ConfigParser()
+config.read('config.ini', encoding='utf-8')
+
+data_path = config['default']['readings_folder']
+archive_path = config['default']['archive_folder']
+BINARY_READINGS = config['default']['readings_format'] == 'binary'
+# further stations are configured in [station <name>] sections
+STATION_SECTION = 'station '
+
+
+streams = load_streams(config)
+
+
+def readings_file(stream, folder=data_path):
+    name = stream.file
+    if BINARY_READINGS:
+        name = os.path.splitext(name)[0] + '.bin'
+    return folder + name
+
+
+BUFFER_LENGTH = config['default']['buffer_window']
+# store room per stream, as a multiple of its nominal sample rate
+RATE_HEADROOM = float(config['default']['rate_headroom'])
+ARCHIVE_INTERVAL = int(config['default']['archive_interval'])
+first_sample = threading.Event()
+# auto asks the station for binary frames and still accepts text lines
+SERIAL_PROTOCOL = config['default']['serial_protocol']
+
+TEMP_MIN = float(config['default']['temperature_low'])
+TEMP_MAX = float(config['default']['temperature_high'])
+HUM_MIN = int(config['default']['humidity_low'])
+HUM_MAX = int(config['default']['humidity_high'])
+LUX_MIN = int(config['default']['light_min'])
+LUX_MAX = int(config['default']['light_max'])
+PRESSURE_JUMP = int(config['default']['pressure_jump_threshold'])
+SERVICE_PORT = int(config['default']['service_port'])
+METRICS_PORT = int(config['default']['metrics_port'])
+# a window attached to a running service serves its own metrics here
+UI_METRICS_PORT = int(config['default']['ui_metrics_port'])
+PUSH_PORT = int(config['default']['push_port'])
+# subscribers get at most one batch per interval and a snapshot of the last history seconds
+PUSH_INTERVAL = float(config['default']['push_interval'])
+PUSH_HISTORY = float(config['default']['push_history'])
+
+baud_rates = [110, 300, 600, 1200, 2400, 4800, 9600, 14400, 19200, 38400, 57600, 115200, 128000, 256000]
+
+
+def serial_ports():
+    # listing ports can take seconds, so it only happens when the port list is opened
+    return serial.tools.list_ports.comports()
+
+
+def create_station(name, section, primary):
+    folder, archive_folder = data_path, archive_path
+    if not primary:
+        # every further station keeps its readings and archive in its own subfolder
+        folder, archive_folder = os.path.join(data_path, name, ''), os.path.join(archive_path, name, '')
+    return Station(name, section['port'], section.get('baud', config['default']['baud']),
+                   streams, {key: readings_file(stream, folder) for key, stream in streams.items()}, archive_folder,
+                   headroom=RATE_HEADROOM,
+                   binary=BINARY_READINGS,
+                   max_points=int(config['default']['archive_max_points']),
+                   jump_threshold=PRESSURE_JUMP,
+                   hysteresis={'T': float(config['default']['temperature_hysteresis']),
+                               'H': float(config['default']['humidity_hysteresis']),
+                               'L': float(config['default']['light_hysteresis'])},
+                   min_on=float(config['default']['actuator_min_on']),
+                   min_off=float(config['default']['actuator_min_off']),
+                   keepalive=float(config['default']['actuator_keepalive']),
+                   protocol=SERIAL_PROTOCOL,
+                   commit_bytes=int(config['default']['commit_bytes']),
+                   commit_interval=float(config['default']['commit_interval']),
+                   fsync=config['default']['readings_fsync'],
+                   reconnect_min=float(config['default']['reconnect_min']),
+                   reconnect_max=float(config['default']['reconnect_max']))
+
+
+def load_stations():
+    sections = [(config['default']['station'], 'default')]
+    sections += [(section[len(STATION_SECTION):], section) for section in config.sections()
+                 if section.startswith(STATION_SECTION)]
+    return {name: create_station(name, config[section], section == 'default') for name, section in sections}
+
+
+PRIMARY = config['default']['station']
+# built by setup(), importing the module only reads the configuration
+records = None
+serial_reader = None
+stations = {}
+supervisor = None
+broker = None
+
+
+def station_section(name):
+    return 'default' if name in (None, PRIMARY) else STATION_SECTION + name
+
+
+def load_settings():
+    global TEMP_COMFORT_LOW, TEMP_COMFORT_HIGH, HUM_COMFORT_LOW, HUM_COMFORT_HIGH, LIGHT_THRESHOLD
+    global serial_port, baud_rate
+    TEMP_COMFORT_LOW = float(config['default']['temperature_comfort_low'])
+    TEMP_COMFORT_HIGH = float(config['default']['temperature_comfort_high'])
+    HUM_COMFORT_LOW = int(config['default']['humidity_comfort_low'])
+    HUM_COMFORT_HIGH = int(config['default']['humidity_comfort_high'])
+    LIGHT_THRESHOLD = int(config['default']['light_threshold'])
+    serial_port = config['default']['port']
+    baud_rate = config['default']['baud']
+    for station in stations.values():
+        station.controller.configure(TEMP_COMFORT_LOW, TEMP_COMFORT_HIGH, HUM_COMFORT_LOW, HUM_COMFORT_HIGH,
+                                     LIGHT_THRESHOLD)
+
+
+load_settings()
+
+
+def setup():
+    global records, serial_reader, stations, supervisor, broker
+    records = queue.Queue(maxsize=int(config['default']['ingest_queue_size']))
+    serial_reader = SerialMultiplexer(records)
+    stations = load_stations()
+    supervisor = SerialSupervisor(list(stations.values()), serial_reader)
+    broker = push.Broker(lambda station, sensor, quantity, start, end, max_points:
+                         query(sensor, quantity, start, end, max_points, station))
+    load_settings()
+
+
+def read_serial():
+    received = drain(records, timeout=0.5)
+    # only the writing is timed, waiting for the first record is idle time
+    with metrics.timer('read_serial'):
+        batches = {}
+        for name, *record in received:
+            batches.setdefault(name, []).append(record)
+        for name, batch in batches.items():
+            station = stations[name]
+            try:
+                station.write(batch)
+            except Exception as error:
+                # a full disk or a failed rotation costs this batch, not the acquisition thread
+                acquire_failed([station], error)
+                continue
+            station.link.acquire_error = None
+            first_sample.set()
+            broker.publish(name, batch)
+            for (sensor, quantity), count in Counter((record[1], record[2]) for record in batch).items():
+                metrics.count('samples', count, station=name, sensor=sensor, quantity=quantity)
+
+
+def acquire_failed(failed, error):
+    message = f"{type(error).__name__}: {error}"
+    # a lasting failure, such as a full disk, is printed once and not for every batch
+    if any(station.link.acquire_error != message for station in failed):
+        traceback.print_exc()
+    for station in failed:
+        station.link.acquire_error = message
+        metrics.count('acquire_errors', station=station.name)
+
+
+@metrics.timed('clean_buffer')
+def clean_buffer():
+    now = datetime.now().timestamp()
+    for station in stations.values():
+        station.clean_buffer(now)
+
+
+def update_config():
+    with open('config.ini', 'w', encoding='utf-8') as configfile:
+        config.write(configfile)
+
+
+def update_settings(settings, station=None):
+    for key, value in settings.items():
+        section = station_section(station) if key in ('port', 'baud') else 'default'
+        config.set(section, key, str(value))
+        if key in ('port', 'baud'):
+            # the supervisor reopens the port with the new settings
+            setattr(stations[station or PRIMARY], key, int(value) if key == 'baud' else value)
+    update_config()
+    load_settings()
+
+
+@metrics.timed('update_controls')
+def update_controls():
+    for station in stations.values():
+        station.update_controls()
+
+
+def station_settings(station=None):
+    section = config[station_section(station)]
+    return {
+        'light_threshold': LIGHT_THRESHOLD,
+        'temperature_comfort_low': TEMP_COMFORT_LOW,
+        'temperature_comfort_high': TEMP_COMFORT_HIGH,
+        'humidity_comfort_low': HUM_COMFORT_LOW,
+        'humidity_comfort_high': HUM_COMFORT_HIGH,
+        'port': section['port'],
+        'baud': section.get('baud', config['default']['baud']),
+    }
+
+
+def snapshot(station=None):
+    data = stations[station or PRIMARY].snapshot()
+    data['stations'] = list(stations)
+    data['settings'] = station_settings(station)
+    return data
+
+
+def summary():
+    snapshots = [station.snapshot() for station in stations.values()]
+    readings = {}
+    for stream in streams.values():
+        if stream.reading is None:
+            continue
+        values = [data['readings'][stream.reading] for data in snapshots if stream.reading in data['readings']]
+        if values:
+            readings[stream.reading] = round(sum(values) / len(values), stream.digits)
+
+    events = [station.pressure_jumps.last_event for station in stations.values()
+              if station.pressure_jumps.last_event is not None]
+    return {
+        'station': None,
+        'readings': readings,
+        'comfort': {},
+        'control': None,
+        'open_timestamp': datetime.fromtimestamp(max(events)).strftime("%H:%M") if events else "",
+        'serial_status': all(data['serial_status'] for data in snapshots),
+        'serial_open': all(data['serial_open'] for data in snapshots),
+        'rooms': {data['station']: {'readings': data['readings'], 'comfort': data['comfort'],
+                                    'serial_open': data['serial_open']} for data in snapshots},
+        'stations': list(stations),
+        'settings': station_settings(),
+    }
+
+
+def query(sensor, quantity, start, end, max_points=None, station=None):
+    return stations[station or PRIMARY].query(sensor, quantity, start, end, max_points)
+
+
+def serve_push(port):
+    names = {name: [push.stream_name(*key) for key in station.streams] for name, station in stations.items()}
+    return push.serve(port, broker, names, PUSH_INTERVAL, PUSH_HISTORY)
+
+
+def serial_backlog():
+    backlog = {}
+    for station in stations.values():
+        # the supervisor may close the connection in between
+        connection = station.connection
+        if station.is_open() and connection is not None:
+            backlog[(('station', station.name),)] = connection.in_waiting
+    return backlog
+
+
+def file_sizes():
+    return {(('station', station.name), ('file', os.path.basename(path))): os.path.getsize(path)
+            for station in stations.values() for path in station.files.values() if os.path.exists(path)}
+
+
+def ingest_errors():
+    return {(('station', station.name), ('kind', kind)): station.reader.stats.snapshot()[kind]
+            for station in stations.values() if station.reader is not None for kind in ('dropped', 'malformed')}
+
+
+def register_gauges():
+    # only a process that runs the service reports its state, an attached window has none
+    metrics.gauge('serial_backlog_bytes', serial_backlog)
+    metrics.gauge('readings_file_bytes', file_sizes)
+    metrics.gauge('ingest_queue_depth', lambda: {(): records.qsize()})
+    metrics.gauge('ingest_errors', ingest_errors)
+    metrics.gauge('writer_pending_bytes', lambda: {(('station', station.name),): station.writer.pending_bytes
+                                                   for station in stations.values()})
+    metrics.gauge('serial_uptime_seconds', supervisor.uptimes)
+    metrics.gauge('push_subscribers', lambda: {(): len(broker.subscriptions)})
+
+
+def handle_request(request):
+    command = request.get('cmd')
+    if command == 'snapshot':
+        return snapshot(request.get('station'))
+    if command == 'summary':
+        return summary()
+    if command == 'query':
+        timestamps, values = query(request['sensor'], request['quantity'], request['start'], request['end'],
+                                   request.get('max_points'), request.get('station'))
+        return {'timestamps': timestamps.tolist(), 'values': values.tolist()}
+    if command == 'settings':
+        update_settings(request['settings'], request.get('station'))
+        return {'ok': True}
+    return {'error': f"nepoznata naredba: {command}"}
+
+
+class ServiceHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = handle_request(json.loads(line))
+            except (ValueError, KeyError) as error:
+                response = {'error': str(error)}
+            except Exception as error:
+                # the client gets an answer and the connection stays usable
+                traceback.print_exc()
+                response = {'error': f"{type(error).__name__}: {error}"}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+def serve(port):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', port), ServiceHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="service", daemon=True).start()
+    return server
+
+
+def call_repeatedly(interval, func, *args):
+    stopped = threading.Event()
+
+    def loop():
+        while not stopped.wait(interval):
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+
+    threading.Thread(target=loop, daemon=True).start()
+    return stopped.set
+
+
+def connect(station):
+    # opening the port right away is faster than looking for it among all ports first
+    return supervisor.connect(station)
+
+
+def close_writers():
+    for station in stations.values():
+        station.writer.close()
+
+
+def start():
+    register_gauges()
+    # samples are read from the first moment and wait in the queue while the history loads
+    serial_reader.start()
+    atexit.register(close_writers)
+    for station in stations.values():
+        connect(station)
+    for station in stations.values():
+        station.load()
+    ArchiveCompactor([station.archive for station in stations.values()], ARCHIVE_INTERVAL).start()
+    # from here on dropped connections and new port settings are handled in the background
+    supervisor.start()
+
+    update_controls()
+    call_repeatedly(1, update_controls)
+
+
+def acquire():
+    if serial_reader.is_alive() and any(station.is_open() for station in stations.values()):
+        try:
+            read_serial()
+            clean_buffer()
+        except Exception as error:
+            acquire_failed(stations.values(), error)
+            time.sleep(0.5)
+    else:
+        time.sleep(0.5)
+
+
+def run():
+    start()
+    while True:
+        acquire()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servis za očitavanje mjerne stanice")
+    parser.add_argument('--profile', type=float, metavar='SEKUNDE',
+                        help="uzorkuj stogove svih dretvi N sekundi i spremi ih za flamegraph")
+    args = parser.parse_args()
+    if args.profile:
+        metrics.profile(args.profile)
+
+    setup()
+    serve(SERVICE_PORT)
+    metrics.serve(METRICS_PORT)
+    serve_push(PUSH_PORT)
+    run()
@@ -0,0 +1,229 @@
+import argparse
+import binascii
+import glob
+import heapq
+import math
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from protocol import BINARY_REQUEST, CRC, SAMPLE, SENSORS, SYNC
+from readings import load_readings, to_epoch
+
+try:
+    import fcntl
+    import termios
+    import tty
+except ImportError:
+    # no pseudo terminals on Windows, only the loopback port is available there
+    tty = None
+
+SENSOR_IDS = {name: sensor_id for sensor_id, name in SENSORS.items()}
+
+# sampling period of every stream in seconds, as scheduled by sensor_station.ino
+PERIODS = {('TMP116', 'T'): 5,
+           ('HDC2010', 'T'): 5,
+           ('DPS310', 'T'): 5,
+           ('HDC2010', 'H'): 5,
+           ('OPT3001', 'L'): 1,
+           ('DPS310', 'P'): 0.25}
+MAX_BATCH = 8
+BATCH_LATENCY = 0.2
+
+
+def synthetic_value(quantity, t):
+    day = 2 * math.pi * t / 86400
+    if quantity == 'T':
+        return 22.5 + 1.5 * math.sin(day) + random.gauss(0, 0.05)
+    if quantity == 'H':
+        return 45 + 10 * math.sin(day) + random.gauss(0, 0.5)
+    if quantity == 'L':
+        return max(0.0, 300 + 250 * math.sin(day) + random.gauss(0, 5))
+    return 98990 + 50 * math.sin(2 * math.pi * t / 3600) + random.gauss(0, 2)
+
+
+def synthetic_samples():
+    # every stream at its nominal frequency, merged in time order
+    schedule = [(0.0, stream) for stream in PERIODS]
+    heapq.heapify(schedule)
+    while True:
+        t, stream = heapq.heappop(schedule)
+        sensor, quantity = stream
+        yield t, sensor, quantity, synthetic_value(quantity, t)
+        heapq.heappush(schedule, (t + PERIODS[stream], stream))
+
+
+def replay_samples(folder):
+    times, values, indices, streams = [], [], [], []
+    for path in sorted(glob.glob(os.path.join(folder, '*.csv'))):
+        with open(path) as file:
+            first = file.readline()
+        if not first:
+            continue
+        # readings files hold one stream each, named in every line
+        timestamp, sensor, quantity, value = first.split(', ')
+        stamps, stream_values = load_readings(path)
+        times.append(to_epoch(stamps))
+        values.append(stream_values)
+        indices.append(np.full(len(stream_values), len(streams)))
+        streams.append((sensor, quantity))
+
+    if not streams:
+        return
+    times = np.concatenate(times)
+    order = np.argsort(times, kind='stable')
+    for t, value, index in zip((times[order] - times[order[0]]).tolist(), np.concatenate(values)[order].tolist(),
+                               np.concatenate(indices)[order].tolist()):
+        sensor, quantity = streams[index]
+        yield t, sensor, quantity, value
+
+
+class LoopbackPort:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+        self.peer = None
+        self.open = True
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            return len(self.buffer)
+
+    def read(self, size=1):
+        with self.lock:
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+        return data
+
+    def write(self, data):
+        with self.peer.lock:
+            self.peer.buffer += data
+        return len(data)
+
+    def isOpen(self):
+        return self.open
+
+    def reset_input_buffer(self):
+        with self.lock:
+            self.buffer.clear()
+
+    def close(self):
+        self.open = False
+
+
+def loopback_pair():
+    host, device = LoopbackPort(), LoopbackPort()
+    host.peer, device.peer = device, host
+    return host, device
+
+
+class PtyPort:
+    def __init__(self):
+        self.fd, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.name = os.ttyname(self.slave)
+
+    @property
+    def in_waiting(self):
+        return int.from_bytes(fcntl.ioctl(self.fd, termios.FIONREAD, b'\0' * 4), 'little')
+
+    def read(self, size=1):
+        return os.read(self.fd, size) if size else b''
+
+    def write(self, data):
+        return os.write(self.fd, data)
+
+    def close(self):
+        os.close(self.fd)
+        os.close(self.slave)
+
+
+class SimulatedStation:
+    def __init__(self, port, samples, speed=1.0, binary_capable=True):
+        self.port = port
+        self.samples = iter(samples)
+        self.speed = speed
+        self.binary_capable = binary_capable
+        self.binary = False
+        self.commands = b''
+        self.batch = []
+        self.batch_started = None
+        self.next = next(self.samples, None)
+        self.sent = 0
+        self.started = time.monotonic()
+
+    def poll_commands(self):
+        waiting = self.port.in_waiting
+        if not waiting:
+            return
+        self.commands += self.port.read(waiting)
+        *frames, self.commands = self.commands.split(b'|')
+        for frame in frames:
+            # same negotiation as the sketch: a fifth character asks for binary frames
+            binary = self.binary_capable and frame[4:5] == BINARY_REQUEST.encode()
+            if self.binary and not binary:
+                self.flush()
+            self.binary = binary
+
+    def flush(self):
+        if not self.batch:
+            return
+        body = bytes([len(self.batch)]) + b''.join(SAMPLE.pack(*sample) for sample in self.batch)
+        self.port.write(SYNC + body + CRC.pack(binascii.crc_hqx(body, 0xFFFF)))
+        self.batch = []
+
+    def emit(self, t, sensor, quantity, value):
+        # millis counts real time, a faster simulation sends more samples, not a faster clock
+        millis = int(t / self.speed * 1000) % 2 ** 32
+        self.sent += 1
+        if not self.binary:
+            self.port.write(f"{sensor}, {quantity}, {value:.2f}, {millis}\r\n".encode())
+            return
+        if not self.batch:
+            self.batch_started = t
+        self.batch.append((SENSOR_IDS[sensor], quantity.encode(), value, millis))
+        if len(self.batch) == MAX_BATCH:
+            self.flush()
+
+    def advance(self, until):
+        # emit everything due up to until, in station seconds, without waiting
+        self.poll_commands()
+        while self.next is not None and self.next[0] <= until:
+            self.emit(*self.next)
+            self.next = next(self.samples, None)
+        if self.batch and (until - self.batch_started) / self.speed >= BATCH_LATENCY:
+            self.flush()
+        return self.next is not None
+
+    def run(self, stopped):
+        while not stopped.is_set():
+            elapsed = (time.monotonic() - self.started) * self.speed
+            if not self.advance(elapsed):
+                self.flush()
+                return
+            stopped.wait(min(BATCH_LATENCY, 0.05))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulirana mjerna stanica na pseudo-terminalu")
+    parser.add_argument('--speed', type=float, default=1, help="višekratnik nazivne frekvencije uzorkovanja")
+    parser.add_argument('--replay', metavar='MAPA', help="ponovi očitanja iz CSV datoteka u mapi")
+    parser.add_argument('--text-only', action='store_true', help="ponašaj se kao stanica bez binarnog protokola")
+    args = parser.parse_args()
+    if tty is None:
+        parser.error("pseudo-terminali nisu dostupni na ovom sustavu")
+
+    port = PtyPort()
+    samples = replay_samples(args.replay) if args.replay else synthetic_samples()
+    station = SimulatedStation(port, samples, args.speed, not args.text_only)
+    print(f"Simulirana stanica na {port.name}, postavite port u config.ini")
+    try:
+        station.run(threading.Event())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        port.close()
@@ -0,0 +1,192 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import serial
+
+import binlog
+from aggregate import JumpDetector, WindowAggregate
+from archive import Archive
+from control import Controller
+from protocol import BINARY_REQUEST
+from readings import format_time, load_readings, to_epoch
+from retention import Retention
+from store import ReadingStore
+from supervisor import SerialLink
+from writer import ReadingsWriter, repair_tail
+
+
+class Station:
+    def __init__(self, name, port, baud, streams, files, archive_folder, headroom, binary, max_points,
+                 jump_threshold, hysteresis, min_on, min_off, keepalive, protocol, commit_bytes, commit_interval,
+                 fsync, reconnect_min, reconnect_max):
+        self.name = name
+        self.port = port
+        self.baud = int(baud)
+        self.binary = binary
+        self.protocol = protocol
+        # (sensor, quantity) routes a sample to its file, the file to its stream settings
+        self.streams = streams
+        self.files = files
+        self.stream_files = {files[key]: stream for key, stream in streams.items()}
+
+        paths = list(self.stream_files)
+        windows = {path: stream.retention for path, stream in self.stream_files.items()}
+        self.store = ReadingStore({path: stream.capacity(headroom) for path, stream in self.stream_files.items()})
+        self.writer = ReadingsWriter(commit_bytes, commit_interval, fsync)
+        self.retention = Retention(windows, binary=binary, writer=self.writer)
+        self.archive = Archive({path: stream.key for path, stream in self.stream_files.items()}, archive_folder,
+                               self.store, windows, max_points)
+        self.aggregates = {path: WindowAggregate(windows[path]) for path in paths}
+        self.pressure_jumps = JumpDetector(jump_threshold)
+        self.controller = Controller(self.write_serial, hysteresis, min_on, min_off, keepalive)
+
+        self.readings = {}
+        self.open_timestamp = ""
+        self.available = False
+        self.connection = None
+        self.reader = None
+        self.link = SerialLink(reconnect_min, reconnect_max)
+
+    def file_check(self):
+        for path in self.files.values():
+            folder = os.path.dirname(path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+
+        if self.binary:
+            for (sensor, quantity), path in self.files.items():
+                binlog.create(path, sensor, quantity)
+                repair_tail(path, binlog.HEADER_SIZE, binlog.RECORD.itemsize)
+        else:
+            for path in self.files.values():
+                open(path, 'a').close()
+                repair_tail(path)
+
+    def load_store(self):
+        now = datetime.now().timestamp()
+        for path, stream in self.stream_files.items():
+            if self.binary:
+                records = binlog.open_records(path)
+                timestamps, values = records['time'], records['value'].astype(float)
+            else:
+                times, values = load_readings(path)
+                timestamps = to_epoch(times)
+            # files written before non-finite values were rejected may still hold some
+            recent = (timestamps >= now - stream.retention) & np.isfinite(values)
+            self.store[path].extend(timestamps[recent], values[recent])
+            self.aggregates[path].extend(timestamps[recent], values[recent])
+            if stream.jumps:
+                self.pressure_jumps.extend(timestamps[recent], values[recent])
+
+        for path, stream in self.stream_files.items():
+            aggregate = self.aggregates[path].snapshot(time.time())
+            if stream.control and aggregate is not None:
+                self.controller.observe(stream.reading, aggregate[stream.aggregate])
+
+    def load(self):
+        self.file_check()
+        self.load_store()
+        self.retention.load()
+        self.archive.load()
+
+    def open(self, flush=True):
+        # non-blocking, the shared reader only reads what is already waiting
+        self.connection = serial.Serial(self.port, self.baud, timeout=0)
+        if flush:
+            self.connection.reset_input_buffer()
+        return self.connection
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def is_open(self):
+        # the supervisor swaps the connection and reader from its own thread
+        connection, reader = self.connection, self.reader
+        return (self.available and connection is not None and connection.isOpen()
+                and reader is not None and reader.error is None)
+
+    def write_serial(self, frame):
+        connection, reader = self.connection, self.reader
+        if self.available and connection is not None:
+            if self.protocol == 'auto':
+                frame = frame[:-1] + BINARY_REQUEST + frame[-1]
+            try:
+                connection.write(frame.encode('utf-8'))
+            except OSError as error:
+                # the supervisor notices the failed reader and reconnects
+                if reader is not None:
+                    reader.error = error
+
+    def write_line(self, path, timestamp, line, value):
+        if self.binary:
+            data = binlog.pack(timestamp, value)
+        else:
+            data = (format_time(timestamp) + ', ' + line).encode()
+        self.writer.write(path, data)
+        self.retention.appended(path, timestamp, len(data))
+
+    def add_sample(self, path, timestamp, value):
+        stream = self.stream_files[path]
+        self.store.append(path, timestamp, value)
+        self.aggregates[path].add(timestamp, value)
+        if stream.jumps:
+            self.pressure_jumps.add(timestamp, value)
+        if stream.control:
+            self.controller.evaluate(stream.reading, self.aggregates[path].snapshot(timestamp)[stream.aggregate],
+                                     timestamp)
+
+    def write(self, batch):
+        for timestamp, sensor, quantity, value, line in batch:
+            path = self.files.get((sensor, quantity))
+            if path is None:
+                continue
+            self.write_line(path, timestamp, line, value)
+            self.add_sample(path, timestamp, value)
+        self.writer.poll()
+
+    def clean_buffer(self, now):
+        for path, stream in self.stream_files.items():
+            self.store[path].expire(now - stream.retention)
+            self.retention[path].expire(now)
+        self.writer.poll()
+
+    def check_pressure(self):
+        if self.pressure_jumps.last_event is not None:
+            self.open_timestamp = datetime.fromtimestamp(self.pressure_jumps.last_event).strftime("%H:%M")
+
+    def update_readings(self):
+        now = time.time()
+        for path, stream in self.stream_files.items():
+            if stream.reading is None:
+                continue
+            aggregate = self.aggregates[path].snapshot(now)
+            if aggregate is not None:
+                self.readings[stream.reading] = stream.reading_value(aggregate)
+
+    def update_controls(self):
+        self.update_readings()
+        self.check_pressure()
+        self.controller.tick()
+
+    def snapshot(self):
+        return {
+            'station': self.name,
+            'readings': dict(self.readings),
+            'comfort': dict(self.controller.comfort),
+            'control': self.controller.stats(),
+            'open_timestamp': self.open_timestamp,
+            'serial_status': self.available,
+            'serial_open': self.is_open(),
+            'ingest': None if self.reader is None else self.reader.stats.snapshot(),
+            'connection': self.link.snapshot(),
+        }
+
+    def query(self, sensor, quantity, start, end, max_points=None):
+        return self.archive.decimated(self.files[sensor, quantity], start, end, max_points)
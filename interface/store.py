@@ -0,0 +1,96 @@
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def _segments(self):
+        end = self.start + self.size
+        if end <= self.capacity:
+            return [slice(self.start, end)]
+        return [slice(self.start, self.capacity), slice(0, end - self.capacity)]
+
+    def append(self, timestamp, value):
+        with self.lock:
+            end = (self.start + self.size) % self.capacity
+            self.times[end] = timestamp
+            self.values[end] = value
+            if self.size < self.capacity:
+                self.size += 1
+            else:
+                self.start = (self.start + 1) % self.capacity
+
+    def extend(self, timestamps, values):
+        timestamps = timestamps[-self.capacity:]
+        values = values[-self.capacity:]
+        with self.lock:
+            end = (self.start + self.size) % self.capacity
+            count = len(timestamps)
+            first = min(count, self.capacity - end)
+            self.times[end:end + first] = timestamps[:first]
+            self.values[end:end + first] = values[:first]
+            self.times[:count - first] = timestamps[first:]
+            self.values[:count - first] = values[first:]
+
+            overflow = max(0, self.size + count - self.capacity)
+            self.start = (self.start + overflow) % self.capacity
+            self.size = min(self.capacity, self.size + count)
+
+    def last(self):
+        with self.lock:
+            if self.size == 0:
+                return None
+            end = (self.start + self.size - 1) % self.capacity
+            return self.times[end], self.values[end]
+
+    def expire(self, cutoff):
+        with self.lock:
+            dropped = 0
+            for segment in self._segments():
+                count = int(np.searchsorted(self.times[segment], cutoff))
+                dropped += count
+                if count < segment.stop - segment.start:
+                    break
+            self.start = (self.start + dropped) % self.capacity
+            self.size -= dropped
+
+    def window(self, since=None, until=None):
+        with self.lock:
+            times = []
+            values = []
+            for segment in self._segments():
+                segment_times = self.times[segment]
+                first = 0 if since is None else int(np.searchsorted(segment_times, since))
+                last = len(segment_times) if until is None else int(np.searchsorted(segment_times, until, 'right'))
+                times.append(segment_times[first:last])
+                values.append(self.values[segment][first:last])
+            return np.concatenate(times), np.concatenate(values)
+
+
+class ReadingStore:
+    def __init__(self, capacities):
+        self.buffers = {key: RingBuffer(capacity) for key, capacity in capacities.items()}
+
+    def __getitem__(self, key):
+        return self.buffers[key]
+
+    def __iter__(self):
+        return iter(self.buffers)
+
+    def append(self, key, timestamp, value):
+        self.buffers[key].append(timestamp, value)
+
+    def expire(self, cutoff):
+        for buffer in self.buffers.values():
+            buffer.expire(cutoff)
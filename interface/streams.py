@@ -0,0 +1,58 @@
+# every stream a station sends is configured in a [stream <sensor> <quantity>] section
+STREAM_SECTION = 'stream '
+# the fastest a plot is redrawn, however often its stream is sampled
+MIN_REFRESH = 200
+
+
+class Stream:
+    def __init__(self, sensor, quantity, file, unit, rate, retention, scale=1.0, title=None, plot=None,
+                 refresh=None, reading=None, name=None, aggregate='mean', digits=None, control=False, jumps=False):
+        self.sensor = sensor
+        self.quantity = quantity
+        self.key = (sensor, quantity)
+        self.file = file
+        self.unit = unit
+        # samples per second and seconds kept in the live window
+        self.rate = rate
+        self.retention = retention
+        self.scale = scale
+        self.title = title or sensor
+        self.plot = plot
+        self.refresh = refresh or max(MIN_REFRESH, int(1000 / rate))
+        # the dashboard reading and actuator unit this stream feeds, if any
+        self.reading = reading
+        self.name = name
+        self.aggregate = aggregate
+        self.digits = digits
+        self.control = control
+        self.jumps = jumps
+
+    def capacity(self, headroom):
+        return int(self.retention * self.rate * headroom) + 1
+
+    def reading_value(self, aggregate):
+        return round(aggregate[self.aggregate] * self.scale, self.digits)
+
+
+def parse_stream(name, section, retention):
+    sensor, quantity = name.split()
+    plot = section.get('plot')
+    return Stream(sensor, quantity, section['file'], section['unit'], section.getfloat('rate'),
+                  section.getfloat('retention', fallback=retention) * 60,
+                  scale=section.getfloat('scale', fallback=1.0),
+                  title=section.get('title'),
+                  plot=tuple(float(position) for position in plot.split(',')) if plot else None,
+                  refresh=section.getint('refresh'),
+                  reading=section.get('reading'),
+                  name=section.get('reading_name'),
+                  aggregate=section.get('aggregate', fallback='mean'),
+                  digits=section.getint('digits'),
+                  control=section.getboolean('control', fallback=False),
+                  jumps=section.getboolean('jumps', fallback=False))
+
+
+def load_streams(config):
+    # retention is given in minutes and defaults to the live window
+    retention = float(config['default']['buffer_window'])
+    return {stream.key: stream for stream in (parse_stream(section[len(STREAM_SECTION):], config[section], retention)
+                                              for section in config.sections() if section.startswith(STREAM_SECTION))}
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import metrics
+
+
+class SerialLink:
+    def __init__(self, backoff_min=0.5, backoff_max=30.0):
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        # (port, baud) the connection was last opened with
+        self.settings = None
+        self.connected_since = None
+        self.reconnects = 0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.error = None
+        # the last failure storing what the station sent, None once a batch is stored again
+        self.acquire_error = None
+
+    def connected(self, settings, now):
+        if self.settings is not None:
+            self.reconnects += 1
+        self.settings = settings
+        self.connected_since = now
+        self.failures = 0
+        self.error = None
+
+    def lost(self, error, now):
+        self.connected_since = None
+        self.error = None if error is None else str(error)
+        # an Arduino that just reset is usually back before the first retry
+        self.retry_at = now + self.backoff_min
+
+    def failed(self, error, now):
+        self.connected_since = None
+        self.error = str(error)
+        self.failures += 1
+        self.retry_at = now + min(self.backoff_max, self.backoff_min * 2 ** self.failures)
+
+    def uptime(self, now):
+        return 0.0 if self.connected_since is None else now - self.connected_since
+
+    def snapshot(self):
+        now = time.monotonic()
+        return {
+            'uptime': round(self.uptime(now), 1),
+            'reconnects': self.reconnects,
+            'failures': self.failures,
+            'retry_in': None if self.connected_since is not None else round(max(0.0, self.retry_at - now), 1),
+            'error': self.error,
+            'acquire_error': self.acquire_error,
+        }
+
+
+class SerialSupervisor(threading.Thread):
+    def __init__(self, stations, reader, interval=0.5):
+        threading.Thread.__init__(self, name="serial-supervisor", daemon=True)
+        self.stations = stations
+        self.reader = reader
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    def stop(self):
+        self.stopped.set()
+
+    def uptimes(self):
+        now = time.monotonic()
+        return {(('station', station.name),): station.link.uptime(now) for station in self.stations}
+
+    def connect(self, station):
+        with self.lock:
+            settings = (station.port, station.baud)
+            now = time.monotonic()
+            try:
+                # bytes left over from other settings are garbage, a reset station only needs a resync
+                station.open(flush=station.link.settings != settings)
+            except (OSError, ValueError) as error:
+                if station.link.error is None:
+                    print(f"{station.name}: uspostavljanje komunikacije neuspješno: provjerite vezu")
+                station.available = False
+                station.link.failed(error, now)
+                return False
+            station.available = True
+            # the first bytes after a reset may end a line that started before it
+            station.reader = self.reader.add(station.name, station.connection, resync=True)
+            if station.link.settings is not None:
+                metrics.count('serial_reconnects', station=station.name)
+            station.link.connected(settings, now)
+            return True
+
+    def disconnect(self, station):
+        self.reader.remove(station.name)
+        station.close()
+
+    def check(self, station, now):
+        link = station.link
+        if station.is_open():
+            if link.settings == (station.port, station.baud):
+                return
+            # a new port or baud from the settings is applied right away
+            self.disconnect(station)
+            link.lost(None, now)
+            link.retry_at = now
+        elif link.connected_since is not None:
+            error = None if station.reader is None else station.reader.error
+            print(f"{station.name}: veza prekinuta, ponovno spajanje")
+            self.disconnect(station)
+            link.lost(error, now)
+        if now >= link.retry_at:
+            self.connect(station)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            now = time.monotonic()
+            for station in self.stations:
+                self.check(station, now)
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import Decimator
+from store import RingBuffer
+
+
+def test_decimator_matches_full_recompute():
+    # every caller takes its own now, so windows move back and forth by a little
+    generator = np.random.default_rng(1)
+    buffer = RingBuffer(100000)
+    width, span = 2.0, 600
+    decimator = Decimator(width)
+    now = 1e9
+    for tick in range(2000):
+        count = int(generator.integers(0, 20))
+        buffer.extend(now + np.sort(generator.uniform(0, 1, count)), generator.normal(20, 5, count))
+        now += 1
+        end = now + generator.uniform(-3, 3)
+        start = end - span + generator.uniform(-3, 3)
+        times, values = decimator.update(buffer, start, end)
+        expected_times, expected_values = Decimator(width).update(buffer, start, end)
+        assert np.array_equal(times, expected_times), tick
+        assert np.array_equal(values, expected_values), tick
@@ -0,0 +1,64 @@
+import tkinter as tk
+
+comfort_messages = {
+    'T': {'ok': "Temperatura je ugodna",
+          'high': "Temperatura je visoka, upalite klimu",
+          'low': "Temperatura je niska, upalite grijanje"},
+    'H': {'ok': "Vlažnost zraka je ugodna",
+          'high': "Vlažnost zraka je visoka",
+          'low': "Vlažnost zraka je niska"},
+    'L': {'dark': "Mračno je, upalite svjetlo"},
+}
+
+# averaged readings go under "Prosječne vrijednosti", the latest ones under "Trenutne vrijednosti"
+ROW_START = {'mean': 0.2125, 'last': 0.375}
+ROW_STEP = 0.0375
+
+
+def measurement_layout(streams):
+    rows = {'mean': 0, 'last': 0}
+    layout = {}
+    for stream in streams:
+        if stream.reading is None:
+            continue
+        group = 'mean' if stream.aggregate == 'mean' else 'last'
+        y = ROW_START[group] + rows[group] * ROW_STEP
+        rows[group] += 1
+        layout[stream.reading] = [stream.name, stream.unit, [0.07, y], [0.36, y]]
+    return layout
+
+
+class BoundLabel:
+    def __init__(self, parent, font, relx, rely):
+        self.text = ""
+        self.variable = tk.StringVar(parent, value=self.text)
+        self.label = tk.Label(parent, textvariable=self.variable, font=font)
+        self.label.place(relx=relx, rely=rely)
+
+    def set(self, text):
+        # skip the Tcl round trip and the redraw when nothing changed
+        if text != self.text:
+            self.text = text
+            self.variable.set(text)
+
+
+def dashboard_texts(data, layout):
+    texts = {}
+    for unit, (name, symbol, reading_position, message_position) in layout.items():
+        value = data['readings'].get(unit)
+        texts['reading', unit] = "" if value is None else f"-{name}: {value} {symbol}"
+        texts['message', unit] = comfort_messages.get(unit, {}).get(data['comfort'].get(unit), "")
+
+    if 'P' in data['readings'] and data['open_timestamp'] != "":
+        texts['message', 'P'] = "Prozor je zadnje otvaran/zatvaran u: " + data['open_timestamp']
+
+    if not data['serial_status']:
+        texts['serial'] = "Uređaj nije pronađen!"
+    elif not data['serial_open']:
+        texts['serial'] = "Uređaj nije spojen!"
+    else:
+        texts['serial'] = ""
+    connection = data.get('connection')
+    if texts['serial'] and connection and connection['retry_in'] is not None:
+        texts['serial'] += f" Ponovni pokušaj za {connection['retry_in']:.0f} s"
+    return texts
@@ -0,0 +1,136 @@
+import os
+import shutil
+import threading
+import time
+
+
+def sync_directory(path):
+    # makes the rename itself durable, directories cannot be opened on Windows
+    try:
+        descriptor = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def replace_tail(path, offset, header, sync=False):
+    # readers only ever see the old or the new file, never a half copied one
+    temp = path + '.tmp'
+    with open(path, 'rb') as source, open(temp, 'wb') as target:
+        target.write(source.read(header))
+        source.seek(offset)
+        shutil.copyfileobj(source, target)
+        size = target.tell()
+        if sync:
+            target.flush()
+            os.fsync(target.fileno())
+    os.replace(temp, path)
+    if sync:
+        sync_directory(path)
+    return size
+
+
+def repair_tail(path, header=0, record_size=None):
+    # a crash during a commit can leave half a line or record at the end
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    if record_size is not None:
+        end = header + max(0, size - header) // record_size * record_size
+    else:
+        with open(path, 'rb') as file:
+            file.seek(max(0, size - 4096))
+            tail = file.read()
+        newline = tail.rfind(b'\n')
+        if newline < 0 and size > len(tail):
+            # no line end in the tail at all, not a torn commit, left to the parser
+            return 0
+        end = size - len(tail) + newline + 1
+    if end < size:
+        with open(path, 'r+b') as file:
+            file.truncate(end)
+    return size - end
+
+
+class ReadingsWriter:
+    def __init__(self, commit_bytes=65536, commit_interval=1.0, fsync='rotate'):
+        self.commit_bytes = commit_bytes
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.handles = {}
+        self.pending = {}
+        self.pending_bytes = 0
+        self.oldest = None
+        self.commits = 0
+        self.rotations = 0
+
+    def handle(self, path):
+        if path not in self.handles:
+            # unbuffered, every commit is one write per file
+            self.handles[path] = open(path, 'ab', buffering=0)
+        return self.handles[path]
+
+    def write(self, path, data):
+        with self.lock:
+            if path not in self.pending:
+                self.pending[path] = bytearray()
+            self.pending[path] += data
+            self.pending_bytes += len(data)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            if self.pending_bytes >= self.commit_bytes:
+                self.commit_locked()
+
+    def poll(self):
+        with self.lock:
+            if self.oldest is not None and time.monotonic() - self.oldest >= self.commit_interval:
+                self.commit_locked()
+
+    def commit(self):
+        with self.lock:
+            self.commit_locked()
+
+    def commit_locked(self):
+        for path, data in self.pending.items():
+            if not data:
+                continue
+            file = self.handle(path)
+            written = file.write(data)
+            while written < len(data):
+                written += file.write(data[written:])
+            if self.fsync == 'commit':
+                os.fsync(file.fileno())
+            data.clear()
+        if self.oldest is not None:
+            self.commits += 1
+        self.pending_bytes = 0
+        self.oldest = None
+
+    def rotate(self, path, offset, header):
+        # the open handle still points at the old file after the rename, so it is reopened on the next commit
+        with self.lock:
+            self.commit_locked()
+            file = self.handles.pop(path, None)
+            if file is not None:
+                file.close()
+            self.rotations += 1
+            return replace_tail(path, offset, header, sync=self.fsync != 'never')
+
+    def close(self):
+        with self.lock:
+            self.commit_locked()
+            for file in self.handles.values():
+                file.close()
+            self.handles.clear()
+
+    def stats(self):
+        return {
+            'pending_bytes': self.pending_bytes,
+            'commits': self.commits,
+            'rotations': self.rotations,
+            'open_files': len(self.handles),
+        }
@@ -19,6 +19,31 @@ Adafruit_Sensor *dps_pressure = dps.getPressureSensor();
 #define LUX_FREQ 1
 #define PRESS_FREQ 4
 
+// Binarni okvir: 0xA5 0x5A, broj uzoraka, uzorci, CRC-16/CCITT broja i uzoraka
+#define FRAME_SYNC_1 0xA5
+#define FRAME_SYNC_2 0x5A
+#define MAX_BATCH 8
+#define BATCH_LATENCY 200
+
+#define TMP116_ID 1
+#define HDC2010_ID 2
+#define OPT3001_ID 3
+#define DPS310_ID 4
+
+struct __attribute__((packed)) Sample {
+  uint8_t sensor;
+  char quantity;
+  float value;
+  uint32_t time;
+};
+
+const char *sensor_names[] = {"", "TMP116", "HDC2010", "OPT3001", "DPS310"};
+
+bool binary_mode = false;
+Sample batch[MAX_BATCH];
+uint8_t batch_count = 0;
+unsigned long batch_stamp = 0;
+
 unsigned long long int temp_stamp = 0, hum_stamp = 0, lux_stamp = 0, press_stamp = 0;
 
 int light_pin = LED_BUILTIN, humidifier_pin = 10, heating_pin = 11, cooling_pin = 12;
@@ -56,6 +81,56 @@ void set_home_devices(char light, char heat, char cool, char hum) {
   }
 }
 
+uint16_t crc16(uint16_t crc, const uint8_t *data, size_t length) {
+  while (length--) {
+    crc ^= (uint16_t)(*data++) << 8;
+    for (uint8_t i = 0; i < 8; i++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void flush_batch() {
+  if (batch_count == 0) {
+    return;
+  }
+
+  uint16_t crc = crc16(0xFFFF, &batch_count, 1);
+  crc = crc16(crc, (uint8_t *)batch, batch_count * sizeof(Sample));
+
+  Serial.write(FRAME_SYNC_1);
+  Serial.write(FRAME_SYNC_2);
+  Serial.write(batch_count);
+  Serial.write((uint8_t *)batch, batch_count * sizeof(Sample));
+  Serial.write((uint8_t *)&crc, sizeof(crc));
+  batch_count = 0;
+}
+
+void send_sample(uint8_t sensor, char quantity, float value) {
+  // Vrijeme uzorka u milisekundama od pokretanja, računalo ga pretvara u stvarno vrijeme
+  uint32_t sample_time = millis();
+
+  if (!binary_mode) {
+    Serial.print(sensor_names[sensor]);
+    Serial.print(", ");
+    Serial.print(quantity);
+    Serial.print(", ");
+    Serial.print(value);
+    Serial.print(", ");
+    Serial.println(sample_time);
+    return;
+  }
+
+  if (batch_count == 0) {
+    batch_stamp = sample_time;
+  }
+  batch[batch_count++] = {sensor, quantity, value, sample_time};
+  if (batch_count == MAX_BATCH) {
+    flush_batch();
+  }
+}
+
 void configHDC2010() {
   ssenseHDC2010.begin();
   ssenseHDC2010.reset();
@@ -113,6 +188,13 @@ void loop() {
     char hum = input[3];
 
     set_home_devices(light, heat, cool, hum);
+
+    // Računalo nakon stanja uređaja može zatražiti binarne okvire
+    bool binary_request = input.length() > 4 && input[4] == 'B';
+    if (binary_mode && !binary_request) {
+      flush_batch();
+    }
+    binary_mode = binary_request;
   }
   
   if (lux_stamp > millis()) {
@@ -127,36 +209,31 @@ void loop() {
     temp_stamp = millis();
     
     // TMP116
-    Serial.print("TMP116, T, ");
-    Serial.println(tmp116.readTemperature());
+    send_sample(TMP116_ID, 'T', tmp116.readTemperature());
   
     // HDC2010
-    Serial.print("HDC2010, T, ");
-    Serial.println(ssenseHDC2010.readTemp());
+    send_sample(HDC2010_ID, 'T', ssenseHDC2010.readTemp());
   
     // DPS310
     sensors_event_t temp_event;
     while (!dps.temperatureAvailable());
     if (dps.temperatureAvailable()) {
       dps_temp->getEvent(&temp_event);
-      Serial.print("DPS310, T, ");
-      Serial.println(temp_event.temperature);
+      send_sample(DPS310_ID, 'T', temp_event.temperature);
     }
   }
   
   // Relativna vlažnost zraka
   if (millis() - hum_stamp >= (HUM_INTERVAL * 1000)) {
     hum_stamp = millis();
-    Serial.print("HDC2010, H, ");
-    Serial.println(ssenseHDC2010.readHumidity());
+    send_sample(HDC2010_ID, 'H', ssenseHDC2010.readHumidity());
   }
   
   // Svjetlost
   if (millis() - lux_stamp >= (1000 / LUX_FREQ)) {
     lux_stamp = millis();
     
-    Serial.print("OPT3001, L, ");
-    Serial.println(opt3001.readResult().lux);
+    send_sample(OPT3001_ID, 'L', opt3001.readResult().lux);
   }
   
   // Tlak
@@ -167,8 +244,11 @@ void loop() {
     while (!dps.pressureAvailable());
     if (dps.pressureAvailable()) {
       dps_pressure->getEvent(&pressure_event);
-      Serial.print("DPS310, P, ");
-      Serial.println(pressure_event.pressure * 100);
+      send_sample(DPS310_ID, 'P', pressure_event.pressure * 100);
     }
   }
+
+  if (batch_count > 0 && millis() - batch_stamp >= BATCH_LATENCY) {
+    flush_batch();
+  }
 }